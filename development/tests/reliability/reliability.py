@@ -9,27 +9,21 @@ import pandas as pd
 import numpy as np
 
 from grmpy.simulate.simulate_auxiliary import simulate_unobservables
-from grmpy.test.random_init import print_dict
-from grmpy.estimate.estimate import estimate
+from grmpy.estimate.estimate import estimate_in_memory
 from grmpy.read.read import read
 
 
-def create_data():
+def create_data(init_dict):
     """This function creates the a data set based on the results from Caineiro 2011."""
-    # Read in initialization file and the data set
-    init_dict = read('reliability.grmpy.ini')
+    # Read in the data set
     df = pd.read_pickle('aer-simulation-mock.pkl')
 
     # Distribute information
     indicator, dep = init_dict['ESTIMATION']['indicator'], init_dict['ESTIMATION']['dependent']
     label_out = [init_dict['varnames'][j - 1] for j in init_dict['TREATED']['order']]
     label_choice = [init_dict['varnames'][j - 1] for j in init_dict['CHOICE']['order']]
-    seed = init_dict['SIMULATION']['seed']
 
-    # Set random seed to ensure recomputabiltiy
-    np.random.seed(seed)
-
-    # Simulate unobservables
+    # Simulate unobservables, the random number generator is seeded from the specification
     U, V = simulate_unobservables(init_dict)
 
     df['U1'], df['U0'], df['V'] = U[:, 0], U[:, 1], V
@@ -59,12 +53,6 @@ def update_correlation_structure(model_dict, rho):
     cov = rho * sd_v * sd_u
     model_dict['DIST']['all'][2] = cov
 
-    # We print out the specification to an initialization file with the name mc_init.grmpy.ini.
-    for key_ in ['TREATED', 'UNTREATED', 'CHOICE']:
-        x = [model_dict['varnames'][j - 1] for j in model_dict[key_]['order']]
-        model_dict[key_]['order'] = x
-    print_dict(model_dict, 'reliability')
-
 
 def get_effect_grmpy(file):
     """This function simply returns the ATE of the data set."""
@@ -87,17 +75,18 @@ def monte_carlo(file, grid_points):
     for key_ in ['grmpy', 'ols', 'true']:
         effects[key_] = []
 
+    # The specification is read only once and updated in memory for each replication
+    model_spec = read(file)
+    X = [model_spec['varnames'][j - 1] for j in model_spec['TREATED']['order']]
+
     # Loop over different correlations between V and U_1
     for rho in np.linspace(0.00, 0.99, grid_points):
 
-        # Readjust the initialization file values to add correlation
-        model_spec = read(file)
-        sim_spec = read('reliability.grmpy.ini')
-        X = [sim_spec['varnames'][j - 1] for j in sim_spec['TREATED']['order']]
+        # Readjust the specification to add correlation
         update_correlation_structure(model_spec, rho)
 
         # Simulate a Data set and specify exogeneous and endogeneous variables
-        df_mc = create_data()
+        df_mc = create_data(model_spec)
         endog, exog, exog_ols = df_mc['wage'], df_mc[X], df_mc[['state'] + X]
 
         # Calculate true average treatment effect
@@ -105,7 +94,7 @@ def monte_carlo(file, grid_points):
         effects['true'] += [ATE]
 
         # Estimate  via grmpy
-        rslt = estimate('reliability.grmpy.ini')
+        rslt = estimate_in_memory(model_spec, df_mc)
         beta_diff = rslt['TREATED']['all'] - rslt['UNTREATED']['all']
         stat = np.dot(np.mean(exog), beta_diff)
 
@@ -3,6 +3,10 @@ import os
 
 import pytest
 
+from grmpy.simulate.simulate import simulate_in_memory
+from grmpy.estimate.estimate import estimate_in_memory
+from grmpy.estimate.estimate_result import save_result
+from grmpy.estimate.estimate_result import load_result
 from grmpy.simulate.simulate import simulate
 from grmpy.estimate.estimate import estimate
 from grmpy.grmpy_config import PACKAGE_DIR
@@ -1,7 +1,11 @@
 """This module provides several auxiliary functions for the check module."""
+import os
+
 import pandas as pd
 import numpy as np
 
+from grmpy.check.custom_exceptions import UserError
+
 from grmpy.simulate.simulate_auxiliary import construct_covariance_matrix
 
 
@@ -13,14 +17,34 @@ def is_pos_def(dict_):
 def read_data(data_file):
     """This function uses different data import methods which depend on the format that is specified
     in the initialization file."""
+    extension = os.path.splitext(data_file)[1]
 
-    if data_file[-4:] == '.pkl':
+    if extension == '.pkl':
         data = pd.read_pickle(data_file)
-    elif data_file[-4:] == '.txt':
+    elif extension == '.txt':
         data = pd.read_table(data_file, delim_whitespace=True, header=0)
-    elif data_file[-4:] == '.dta':
+    elif extension == '.dta':
         data = pd.read_stata(data_file)
         data = data.drop(['index'], axis=1)
+    elif extension in ['.parquet', '.feather']:
+        if not hasattr(pd, 'read_' + extension[1:]):
+            msg = 'The {} format is not supported by the installed version of pandas.' \
+                .format(extension)
+            raise UserError(msg)
+        try:
+            if extension == '.parquet':
+                data = pd.read_parquet(data_file)
+            else:
+                data = pd.read_feather(data_file)
+        except ImportError:
+            msg = 'The {} format requires the pyarrow package, which is not installed.' \
+                .format(extension)
+            raise UserError(msg)
+    elif extension == '.npz':
+        # The columns of an npz archive are stored in the order in which they were written.
+        with np.load(data_file, allow_pickle=False) as archive:
+            data = pd.DataFrame({label: archive[label] for label in archive.files},
+                                columns=archive.files)
     return data
 
 
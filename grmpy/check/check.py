@@ -49,11 +49,114 @@ def check_initialization_dict(dict_):
     if error is True:
         raise UserError(msg)
 
-    if dict_['ESTIMATION']['file'][-4:] not in ['.pkl', '.txt', 'dta']:
+    # The data file is not required if the data is passed to the estimation directly.
+    extension = os.path.splitext(dict_['ESTIMATION'].get('file', '.pkl'))[1]
+    if extension not in ['.pkl', '.txt', '.dta', '.parquet', '.feather', '.npz']:
         msg = 'The {} format specified in the Estimation section of the initialization file' \
               ' is currently not supported by grmpy. \n' \
-              '         Please use either .txt, .pkl or .dta files.'\
-            .format(dict_['ESTIMATION']['file'][-4:])
+              '         Please use either .txt, .pkl, .dta, .parquet, .feather or .npz files.'\
+            .format(extension)
+        raise UserError(msg)
+
+    for format_ in dict_['SIMULATION']['formats']:
+        if format_ not in ['pkl', 'txt', 'parquet', 'feather', 'npz']:
+            msg = 'The output format {} specified in the Simulation section of the ' \
+                  'initialization file is not supported by grmpy. \n' \
+                  '         Please use pkl, txt, parquet, feather, npz or none.'.format(format_)
+            raise UserError(msg)
+
+    if dict_['SIMULATION']['rng'] not in ['legacy', 'pcg64', 'philox']:
+        msg = 'The random number generator {} specified in the Simulation section of the ' \
+              'initialization file is not supported by grmpy. \n' \
+              '         Please use either legacy, pcg64 or philox.'\
+            .format(dict_['SIMULATION']['rng'])
+        raise UserError(msg)
+
+    if dict_['SIMULATION']['rng'] != 'legacy' and not hasattr(np.random, 'Generator'):
+        msg = 'The {} random number generator requires numpy 1.17 or later.'\
+            .format(dict_['SIMULATION']['rng'])
+        raise UserError(msg)
+
+    if dict_['SIMULATION']['chunksize'] < 0:
+        msg = 'The chunksize in the Simulation section can not be negative.'
+        raise UserError(msg)
+
+    if 0 < dict_['SIMULATION']['chunksize'] < num_agents_sim and \
+            'pkl' in dict_['SIMULATION']['formats']:
+        msg = 'The pkl format can not be written in chunks. \n' \
+              '         Please choose other output formats for a simulation in chunks.'
+        raise UserError(msg)
+
+    if dict_['ESTIMATION']['se_method'] not in ['hessian', 'opg', 'sandwich', 'numerical']:
+        msg = 'The standard error method {} specified in the Estimation section of the ' \
+              'initialization file is not supported by grmpy. \n' \
+              '         Please use either hessian, opg, sandwich or numerical.'\
+            .format(dict_['ESTIMATION']['se_method'])
+        raise UserError(msg)
+
+    if dict_['ESTIMATION']['workers'] < 1 or dict_['ESTIMATION']['chunksize'] < 0:
+        msg = 'The number of workers has to be positive and the chunksize can not be negative.'
+        raise UserError(msg)
+
+    if dict_['ESTIMATION']['stream'] not in [0, 1]:
+        msg = 'The stream option in the Estimation section has to be either 0 or 1.'
+        raise UserError(msg)
+
+    if dict_['ESTIMATION']['stream'] == 1 and dict_['ESTIMATION']['comparison'] != 0:
+        msg = 'The comparison output requires the whole sample in memory and is not available ' \
+              'if the data is streamed.'
+        raise UserError(msg)
+
+    optimizer = dict_['ESTIMATION'].get('optimizer', 'SCIPY-BFGS')
+    if optimizer not in ['SCIPY-BFGS', 'SCIPY-POWELL', 'SCIPY-TRUST-NCG', 'SCIPY-TRUST-EXACT',
+                         'GRMPY-NEWTON', 'GRMPY-BHHH', 'GRMPY-ADAM']:
+        msg = 'The optimizer {} specified in the Estimation section of the initialization file ' \
+              'is not supported by grmpy. \n' \
+              '         Please use either SCIPY-BFGS, SCIPY-POWELL, SCIPY-TRUST-NCG, ' \
+              'SCIPY-TRUST-EXACT, GRMPY-NEWTON, GRMPY-BHHH or GRMPY-ADAM.'.format(optimizer)
+        raise UserError(msg)
+
+    if optimizer in ['SCIPY-TRUST-NCG', 'SCIPY-TRUST-EXACT', 'GRMPY-NEWTON', 'GRMPY-BHHH']:
+        if dict_[optimizer]['gtol'] <= 0:
+            msg = 'The gradient tolerance of the {} optimizer has to be positive.'.format(optimizer)
+            raise UserError(msg)
+
+    if optimizer == 'GRMPY-ADAM':
+        opts = dict_['GRMPY-ADAM']
+        if opts['batch'] < 1 or opts['rate'] <= 0 or opts['decay'] < 0 or opts['refine'] < 0:
+            msg = 'The batch size and the learning rate of the GRMPY-ADAM optimizer have to be ' \
+                  'positive, the decay and the number of refinement iterations can not be ' \
+                  'negative.'
+            raise UserError(msg)
+
+    stages = dict_['ESTIMATION']['stages']
+    if not all(0.0 < i <= 1.0 for i in stages) or sorted(set(stages)) != stages:
+        msg = 'The stages in the Estimation section have to be increasing shares of the agents ' \
+              'between zero and one.'
+        raise UserError(msg)
+
+    if dict_['ESTIMATION']['trace'] < 0:
+        msg = 'The number of stored evaluations in the Estimation section can not be negative.'
+        raise UserError(msg)
+
+    est = dict_['ESTIMATION']
+    if est['starts'] < 1 or est['rounds'] < 1 or est['processes'] < 0:
+        msg = 'The number of starts and the number of iterations per round in the Estimation ' \
+              'section have to be positive, the number of processes can not be negative.'
+        raise UserError(msg)
+
+    if est['margin'] < 0 or est['spread'] < 0:
+        msg = 'The margin and the spread of the starts in the Estimation section can not be ' \
+              'negative.'
+        raise UserError(msg)
+
+    if est['interval'] < 0 or est['budget'] < 0:
+        msg = 'The interval of the checkpoints and the time budget in the Estimation section can ' \
+              'not be negative.'
+        raise UserError(msg)
+
+    if est['cache_size'] <= 0:
+        msg = 'The size of the result cache in the Estimation section has to be positive.'
         raise UserError(msg)
 
 
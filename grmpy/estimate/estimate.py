@@ -1,31 +1,46 @@
 """The module provides an estimation process given the simulated data set and the initialization
 file."""
-from scipy.optimize import minimize
+from scipy.optimize import OptimizeResult
 import numpy as np
+import time
 
-from grmpy.estimate.estimate_auxiliary import backward_transformation
+from grmpy.estimate.estimate_checkpoint import restore_random_state
 from grmpy.estimate.estimate_auxiliary import minimizing_interface
+from grmpy.estimate.estimate_checkpoint import checkpoint_callback
+from grmpy.estimate.estimate_auxiliary import backward_transformation
+from grmpy.estimate.estimate_checkpoint import create_checkpoint
+from grmpy.estimate.estimate_checkpoint import write_checkpoint
+from grmpy.estimate.estimate_checkpoint import BudgetExhausted
+from grmpy.estimate.estimate_checkpoint import read_checkpoint
+from grmpy.estimate.estimate_checkpoint import STATUS_BUDGET
 from grmpy.estimate.estimate_auxiliary import calculate_criteria
+from grmpy.estimate.estimate_cache import lookup_result
+from grmpy.estimate.estimate_cache import store_result
+from grmpy.estimate.estimate_cache import cache_key
 from grmpy.estimate.estimate_auxiliary import optimizer_options
 from grmpy.check.check import check_presence_estimation_dataset
 from grmpy.estimate.estimate_output import write_comparison
 from grmpy.estimate.estimate_auxiliary import adjust_output
+from grmpy.estimate.estimate_likelihood import subsample_data
+from grmpy.estimate.estimate_likelihood import prepare_stream
+from grmpy.estimate.estimate_likelihood import prepare_data
 from grmpy.estimate.estimate_auxiliary import start_values
+from grmpy.estimate.estimate_multistart import screen_starts
 from grmpy.estimate.estimate_output import print_logfile
-from grmpy.estimate.estimate_auxiliary import bfgs_dict
+from grmpy.estimate.estimate_optimizers import optimize
+from grmpy.estimate.estimate_trace import create_trace
+from grmpy.estimate.estimate_trace import close_trace
 from grmpy.check.check import check_initialization_dict
-from grmpy.check.check import check_presence_init
 from grmpy.check.check import check_init_file
-from grmpy.check.auxiliary import read_data
+from grmpy.estimate.estimate_data import load_cache
+from grmpy.estimate.estimate_data import load_data
+from grmpy.read.read import process_init_dict
 from grmpy.read.read import read
 
 
 def estimate(init_file):
     """The function estimates the coefficients of the simulated data set."""
-    check_presence_init(init_file)
-
     dict_ = read(init_file)
-    np.random.seed(dict_['SIMULATION']['seed'])
 
     # We perform some basic consistency checks regarding the user's request.
     check_presence_estimation_dataset(dict_)
@@ -40,30 +55,184 @@ def estimate(init_file):
     else:
         option = dict_['ESTIMATION']['start']
 
-    # Read data frame
-    data = read_data(data_file)
+    # The result of an identical estimation is reused if a cache directory is specified.
+    key_ = cache_key(dict_) if 'cache' in dict_['ESTIMATION'].keys() else None
+    entry = lookup_result(dict_, key_) if key_ is not None else None
 
-    # define starting values
-    x0 = start_values(dict_, data, option)
-    opts, method = optimizer_options(dict_)
-    dict_['AUX']['criteria'] = calculate_criteria(dict_, data, x0)
-    dict_['AUX']['starting_values'] = backward_transformation(x0)
-    rslt_dict = bfgs_dict()
-    if opts['maxiter'] == 0:
-        rslt = adjust_output(None, dict_, x0, data, rslt_dict)
+    # Read data frame and split it by treatment status once for the likelihood evaluations. Both are
+    # kept in memory for the following estimations on the same data file. In the streaming mode the
+    # agents are read in blocks from a memory-mapped cache instead and the data frame is never
+    # constructed, so there is no comparison output.
+    data = None
+    if entry is not None:
+        rslt = entry['rslt']
+        dict_['AUX']['criteria'] = entry['criteria']
+        dict_['AUX']['starting_values'] = entry['starting_values']
+        if entry['warning'] is not None:
+            dict_['ESTIMATION']['warning'] = entry['warning']
     else:
-        opt_rslt = minimize(
-            minimizing_interface, x0, args=(dict_, data, rslt_dict), method=method, options=opts)
-        rslt = adjust_output(opt_rslt, dict_, opt_rslt['x'], data, rslt_dict)
+        if dict_['ESTIMATION']['stream'] == 1:
+            prep = prepare_stream(dict_, load_cache(data_file))
+        else:
+            data, prep = load_data(dict_, data_file)
+
+        rslt = estimate_model(dict_, prep, option)
+
+        if key_ is not None:
+            entry = {'rslt': rslt, 'criteria': dict_['AUX']['criteria'],
+                     'starting_values': dict_['AUX']['starting_values'],
+                     'warning': dict_['ESTIMATION'].get('warning')}
+            store_result(dict_, key_, entry)
+
     # Print Output files
     print_logfile(dict_, rslt)
 
-    if 'comparison' in dict_['ESTIMATION'].keys():
-        if dict_['ESTIMATION']['comparison'] == 0:
-            pass
-        else:
-            write_comparison(dict_, data, rslt)
-    else:
+    if dict_['ESTIMATION']['comparison'] != 0:
+        if data is None:
+            data, _ = load_data(dict_, data_file)
         write_comparison(dict_, data, rslt)
 
     return rslt
+
+
+def estimate_in_memory(spec, data):
+    """The function estimates the coefficients for a specification that is available as a
+    dictionary, for instance the result of read, and a data frame. In contrast to estimate, the
+    data is not read from a file and there are no output files.
+    """
+    dict_ = process_init_dict(spec)
+
+    # We perform some basic consistency checks regarding the user's request.
+    check_initialization_dict(dict_)
+    check_init_file(dict_)
+
+    if dict_['ESTIMATION']['maxiter'] == 0:
+        option = 'init'
+    else:
+        option = dict_['ESTIMATION']['start']
+
+    return estimate_model(dict_, prepare_data(dict_, data), option)
+
+
+def estimate_model(dict_, prep, option):
+    """The function maximizes the likelihood for the prepared estimation data, starting from the
+    start values that are selected by option. If several stages are requested, the likelihood is
+    first maximized for growing random subsamples of the agents, each stage starting from the
+    result of the previous one. Only the last stage and the standard errors use all agents. If
+    several starts are requested, they are screened on the sample of the first stage and the
+    estimation continues from the best one.
+    """
+    opts, _ = optimizer_options(dict_)
+    stages = dict_['ESTIMATION']['stages'] if opts['maxiter'] > 0 else [1.0]
+    subsamples = draw_subsamples(dict_, prep, stages)
+
+    # define starting values
+    x0 = start_values(dict_, subsamples[0], option)
+    dict_['AUX']['criteria'] = calculate_criteria(dict_, prep, x0)
+    dict_['AUX']['starting_values'] = backward_transformation(x0)
+    if opts['maxiter'] == 0:
+        rslt = adjust_output(None, dict_, x0, prep)
+    else:
+        resumed = read_checkpoint(dict_) if option == 'resume' else None
+        checkpoint = create_checkpoint(dict_, resumed)
+
+        rslt_starts = []
+        if dict_['ESTIMATION']['starts'] > 1 and resumed is None:
+            x0, rslt_starts = screen_starts(dict_, subsamples[0], x0)
+
+        rslt_stages, opt_rslt = [], None
+        checkpoint['stage'] = min(checkpoint['stage'], len(stages) - 1)
+        for stage, (share, subsample) in enumerate(zip(stages, subsamples)):
+            if stage < checkpoint['stage']:
+                continue
+            start = time.time()
+
+            # The result of the previous stage is only used if it improves upon its start values
+            # for the current sample as well.
+            if opt_rslt is not None and np.all(np.isfinite(opt_rslt['x'])):
+                x0 = min([x0, opt_rslt['x']], key=lambda x: calculate_criteria(dict_, subsample, x))
+
+            if share < 1.0:
+                trace = create_trace(dict_['AUX']['num_paras'], dict_['ESTIMATION']['trace'])
+            else:
+                # A resumed final stage continues the trace file of the interrupted estimation.
+                append = resumed is not None and resumed['stage'] == stage
+                trace = create_trace(dict_['AUX']['num_paras'], dict_['ESTIMATION']['trace'],
+                                     fname=dict_['ESTIMATION'].get('trace_file'), append=append)
+
+            # A resumed stage continues with the remaining iterations and the state of the random
+            # number generator at the time of the checkpoint.
+            stage_dict = dict_
+            if checkpoint['nit'] > 0:
+                stage_dict = dict(dict_)
+                stage_dict['ESTIMATION'] = dict(dict_['ESTIMATION'])
+                stage_dict['ESTIMATION']['maxiter'] = max(opts['maxiter'] - checkpoint['nit'], 1)
+                random_state = restore_random_state(resumed) if resumed is not None else None
+                if random_state is not None:
+                    trace['random_state'] = random_state
+
+            try:
+                callback = checkpoint_callback(dict_, checkpoint, trace)
+                opt_rslt = optimize(x0, stage_dict, subsample, trace, callback)
+            except BudgetExhausted:
+                opt_rslt, trace = stop_optimization(dict_, prep, checkpoint, trace, share)
+            finally:
+                close_trace(trace)
+
+            rslt_stages += [{'share': share, 'agents': subsample['num_agents'],
+                             'nfev': opt_rslt['nfev'], 'crit': opt_rslt['fun'],
+                             'time': time.time() - start}]
+            if opt_rslt['status'] == STATUS_BUDGET:
+                break
+
+            # The checkpoint after each stage refers to the start of the next stage.
+            if share < 1.0:
+                checkpoint['stage'], checkpoint['nit'] = stage + 1, 0
+                write_checkpoint(dict_, checkpoint, opt_rslt['x'], trace, 'running')
+                checkpoint['nfev'] += trace['num_evals']
+            else:
+                write_checkpoint(dict_, checkpoint, opt_rslt['x'], trace, 'finished')
+
+        rslt = adjust_output(opt_rslt, dict_, opt_rslt['x'], prep, trace)
+        rslt['stages'], rslt['starts'] = rslt_stages, rslt_starts
+
+    return rslt
+
+
+def stop_optimization(dict_, prep, checkpoint, trace, share):
+    """The function returns the result of an optimization that is stopped because its time budget
+    is exhausted. The most recent parameters are evaluated for all agents, which is required for
+    the output if the budget is exhausted in an earlier stage.
+    """
+    if share < 1.0:
+        trace = create_trace(dict_['AUX']['num_paras'], dict_['ESTIMATION']['trace'])
+
+    x = np.array(checkpoint['x'])
+    fun = minimizing_interface(x, dict_, prep, trace)
+    opt_rslt = OptimizeResult(x=x, fun=fun, success=False, status=STATUS_BUDGET,
+                              message='The time budget has been exhausted.',
+                              nfev=trace['num_evals'], nit=checkpoint['nit'])
+
+    return opt_rslt, trace
+
+
+def draw_subsamples(dict_, prep, stages):
+    """The function returns the prepared data for each stage of the estimation. The subsamples are
+    nested and drawn without replacement from the agents, where the seed of the simulation
+    determines their selection.
+    """
+    if stages == [1.0]:
+        return [prep]
+
+    random_state = np.random.RandomState(dict_['SIMULATION']['seed'])
+    agents = random_state.permutation(prep['num_agents'])
+
+    subsamples = []
+    for share in stages:
+        if share < 1.0:
+            num_agents = max(int(round(share * prep['num_agents'])), 1)
+            subsamples += [subsample_data(dict_, prep, np.sort(agents[:num_agents]))]
+        else:
+            subsamples += [prep]
+
+    return subsamples
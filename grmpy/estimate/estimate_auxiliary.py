@@ -1,58 +1,50 @@
 """The module provides auxiliary functions for the estimation process"""
-from statsmodels.tools.sm_exceptions import PerfectSeparationError
-from statsmodels.tools.numdiff import approx_hess_cs
+from statsmodels.tools.numdiff import approx_hess3
 from numpy.linalg import LinAlgError
 from scipy.stats import norm
-import statsmodels.api as sm
-import pandas as pd
 import numpy as np
 
+from grmpy.estimate.estimate_likelihood import individual_contributions
+from grmpy.estimate.estimate_likelihood import information_matrices
+from grmpy.estimate.estimate_likelihood import prepare_data
+from grmpy.estimate.estimate_start import result_start_values
+from grmpy.estimate.estimate_start import auto_start_values
+from grmpy.estimate.estimate_checkpoint import read_checkpoint
+from grmpy.estimate.estimate_trace import record_evaluation
+from grmpy.estimate.estimate_likelihood import criterion
+from grmpy.estimate.estimate_likelihood import gradient
 from grmpy.check.check import check_start_values
 from grmpy.check.check import UserError
 
 
 def start_values(init_dict, data_frame, option):
-    """The function selects the start values for the minimization process."""
+    """The function selects the start values for the minimization process. The data can either be
+    passed as a data frame or as the output of prepare_data or prepare_stream. A resumed
+    estimation starts from the parameters of its checkpoint, a warm start from the result of a
+    previous estimation.
+    """
     if not isinstance(init_dict, dict):
         msg = 'The input object ({})for specifing the start values isn`t a dictionary.' \
             .format(init_dict)
         raise UserError(msg)
-    indicator = init_dict['ESTIMATION']['indicator']
-    dep = init_dict['ESTIMATION']['dependent']
 
-    if option == 'init':
+    if option == 'resume':
+        # The checkpoint contains the transformed parameters already
+        return np.array(read_checkpoint(init_dict)['x'])
+    elif option == 'result':
+        # Map the coefficients of a previous estimation result onto the current specification
+        x0 = result_start_values(init_dict)
+    elif option == 'init':
         # Set coefficients equal the true init file values
         x0 = init_dict['AUX']['init_values'][:-6]
     elif option == 'auto':
 
         try:
-
-            # Estimate beta1 and beta0:
-            beta = []
-            sd_ = []
-
-            for i in [1.0, 0.0]:
-                Y = data_frame[dep][data_frame[indicator] == i]
-                if i == 1:
-                    order = init_dict['TREATED']['order']
-                else:
-                    order = init_dict['UNTREATED']['order']
-                X = data_frame[[init_dict['varnames'][j - 1] for j in order]][
-                    i == data_frame[indicator]]
-
-                ols_results = sm.OLS(Y, X).fit()
-                beta += [ols_results.params]
-                sd_ += [np.sqrt(ols_results.scale), 0.0]
-            # Estimate gamma via Probit
-            Z = data_frame[[init_dict['varnames'][j - 1] for j in init_dict['CHOICE']['order']]]
-            probitRslt = sm.Probit(data_frame[indicator], Z).fit(disp=0)
-            gamma = probitRslt.params
-            # Adjust estimated cost-benefit shifter and intercept coefficients
-            # Arrange starting values
-            x0 = np.concatenate((beta[0], beta[1], gamma, sd_))
+            # Estimate beta1 and beta0 by OLS and gamma via Probit
+            x0 = auto_start_values(init_dict, prepare_data(init_dict, data_frame))
             check_start_values(x0)
 
-        except (PerfectSeparationError, ValueError, UserError):
+        except (LinAlgError, ValueError, UserError):
             msg = 'The estimation process wasn`t able to provide automatic start values due to ' \
                   'perfect seperation. \n                                                     ' \
                   ' The intialization specifications are used as start ' \
@@ -90,7 +82,7 @@ def start_value_adjustment(x, init_dict, option):
     return x
 
 
-def backward_transformation(x0, dict_=None):
+def backward_transformation(x0):
     """The function generates a dictionary for the representation of the optimization output."""
     x = x0.copy()
     for k in [-4, -3, -2, -1]:
@@ -98,59 +90,38 @@ def backward_transformation(x0, dict_=None):
             x[k] = (np.exp(2 * x[k]) - 1) / (np.exp(2 * x[k]) + 1)
         else:
             x[k] = np.exp(x[k])
-    if dict_ is None:
-        pass
-    else:
-        dict_['parameter'][str(len(dict_['parameter']))] = x
     return x
 
 
-def log_likelihood(x0, init_dict, data_frame, dict_=None):
-    """The function provides the log-likelihood function for the minimization process."""
-    # Distribute parameter
-    num_treated = init_dict['AUX']['num_covars_treated']
-    num_untreated = num_treated + init_dict['AUX']['num_covars_untreated']
+def log_likelihood(x0, init_dict, data):
+    """The function provides the log-likelihood function for the minimization process. The data
+    can either be passed as a data frame or as the output of prepare_data.
+    """
+    prep = prepare_data(init_dict, data)
+    likl = criterion(x0, init_dict, prep)
 
-    beta1, beta0, gamma = x0[:num_treated], x0[num_treated:num_untreated], x0[num_untreated:-4]
-    sd1, sd0, rho1v, rho0v, sdv = x0[-4], x0[-2], x0[-3], x0[-1], 1.0
-    # Set labels for indicator and the dependent variable
-    indicator = init_dict['ESTIMATION']['indicator']
-    dep = init_dict['ESTIMATION']['dependent']
-    # Provide parameterization for D=1 and D=0 and provide auxiliary list likl
-    likl = []
-    for i in [0.0, 1.0]:
-        if i == 1.0:
-            beta, gamma, rho, sd, sdv = beta1, gamma, rho1v, sd1, sdv
-            key_ = 'TREATED'
-        else:
-            beta, gamma, rho, sd, sdv = beta0, gamma, rho0v, sd0, sdv
-            key_ = 'UNTREATED'
-        # Prepare data
-        data = data_frame[data_frame[indicator] == i]
-        Z = data[[init_dict['varnames'][j - 1] for j in init_dict['CHOICE']['order']]]
-        X = data[[init_dict['varnames'][j - 1] for j in init_dict[key_]['order']]]
+    return likl
 
-        choice_ = pd.DataFrame.sum(gamma * Z, axis=1)
-        part1 = (data[dep] - pd.DataFrame.sum(beta * X, axis=1)) / sd
-        part2 = (choice_ - rho * sdv * part1) / (np.sqrt((1 - (rho ** 2)) * (sdv ** 2)))
-        dist_1, dist_2 = norm.pdf(part1), norm.cdf(part2)
 
-        if i == 1.0:
-            contrib = (1.0 / sd) * dist_1 * dist_2
+def log_likelihood_gradient(x0, init_dict, data):
+    """The function provides the analytical gradient of the log-likelihood function with respect to
+    the parameters in their original form.
+    """
+    prep = prepare_data(init_dict, data)
+    grad = gradient(x0, init_dict, prep)
 
-        else:
-            contrib = (1.0 / sd) * dist_1 * (1.0 - dist_2)
+    return grad
 
-        likl.append(contrib)
-    likl = np.append(likl[0], likl[1])
-    likl = - np.mean(np.log(np.clip(likl, 1e-20, np.inf)))
 
-    if dict_ is None:
-        pass
-    else:
-        dict_['crit'][str(len(dict_['crit']))] = likl
+def likelihood_contributions(x0, init_dict, data):
+    """The function provides the individual log-likelihood contributions and the matrix of the
+    individual scores for the parameters in their original form. The rows of both arrays follow the
+    order of the agents in the data set.
+    """
+    prep = prepare_data(init_dict, data)
+    contrib, scores = individual_contributions(x0, init_dict, prep)
 
-    return likl
+    return contrib, scores
 
 
 def calculate_criteria(init_dict, data_frame, x0):
@@ -165,36 +136,84 @@ def optimizer_options(init_dict_):
     method = init_dict_['ESTIMATION']['optimizer'].split('-')[1:]
     if isinstance(method, list):
         method = '-'.join(method)
-    opt_dict = init_dict_['SCIPY-' + method]
+    opt_dict = init_dict_[init_dict_['ESTIMATION']['optimizer']]
     opt_dict['maxiter'] = init_dict_['ESTIMATION']['maxiter']
 
     return opt_dict, method
 
 
-def minimizing_interface(x0, init_dict, data_frame, dict_):
-    """The function provides the minimization interface for the estimation process."""
+def minimizing_interface(x0, init_dict, data_frame, trace):
+    """The function provides the minimization interface for the estimation process. Each
+    evaluation is added to the trace of the optimization.
+    """
     # Collect arguments
-    x0 = backward_transformation(x0, dict_)
+    x0 = backward_transformation(x0)
     # Calculate likelihood for pre-specified arguments
-    likl = log_likelihood(x0, init_dict, data_frame, dict_)
+    likl = log_likelihood(x0, init_dict, data_frame)
+    record_evaluation(trace, x0, likl)
 
     return likl
 
 
-def process_output(init_dict, dict_, x0, flag):
+def gradient_interface(x0, init_dict, data_frame, trace=None):
+    """The function provides the gradient of the criterion function with respect to the transformed
+    parameters that are used during the minimization process.
+    """
+    x = backward_transformation(x0)
+    grad = log_likelihood_gradient(x, init_dict, data_frame)
+
+    # Apply the chain rule for the transformation of the distributional characteristics
+    for k in [-4, -3, -2, -1]:
+        if k in [-3, -1]:
+            grad[k] *= 1 - x[k] ** 2
+        else:
+            grad[k] *= x[k]
+
+    return grad
+
+
+def hessian_interface(x0, init_dict, data_frame, trace=None, kind='hessian'):
+    """The function provides the hessian matrix of the criterion function with respect to the
+    transformed parameters that are used during the minimization process. Alternatively, the outer
+    product of the individual scores is provided, which approximates the hessian matrix.
+    """
+    x = backward_transformation(x0)
+    prep = prepare_data(init_dict, data_frame)
+    hess, opg = information_matrices(x, init_dict, prep)
+
+    # Apply the chain rule for the transformation of the distributional characteristics
+    first, second = np.ones(len(x)), np.zeros(len(x))
+    for k in [-4, -3, -2, -1]:
+        if k in [-3, -1]:
+            first[k], second[k] = 1 - x[k] ** 2, -2 * x[k] * (1 - x[k] ** 2)
+        else:
+            first[k], second[k] = x[k], x[k]
+
+    if kind == 'opg':
+        return first[:, None] * opg * first[None, :]
+
+    hess = first[:, None] * hess * first[None, :]
+    hess[np.diag_indices(len(x))] += log_likelihood_gradient(x, init_dict, prep) * second
+
+    return hess
+
+
+def process_output(init_dict, trace, x0, flag):
     """The function checks if the criteria function value is smaller for the optimization output as
     for the start values.
     """
-
-    x = min(dict_['crit'], key=dict_['crit'].get)
+    best = trace['best']
     if flag == 'adjustment':
-        if dict_['crit'][str(x)] < init_dict['AUX']['criteria']:
-            x0 = dict_['parameter'][str(x)].tolist()
-            crit = dict_['crit'][str(x)]
-            warning = 'The optimization algorithm has failed to provide the parametrization that ' \
-                      'leads to the minimal criterion function value. \n                         ' \
-                      '                             The estimation output is automatically ' \
-                      'adjusted.'
+        if best['crit'] < init_dict['AUX']['criteria']:
+            x0 = best['parameter'].tolist()
+            crit = best['crit']
+        else:
+            x0 = init_dict['AUX']['starting_values']
+            crit = init_dict['AUX']['criteria']
+        warning = 'The optimization algorithm has failed to provide the parametrization that ' \
+                  'leads to the minimal criterion function value. \n                         ' \
+                  '                             The estimation output is automatically ' \
+                  'adjusted.'
     if flag == 'notfinite':
         x0 = init_dict['AUX']['starting_values']
         crit = init_dict['AUX']['criteria']
@@ -203,31 +222,22 @@ def process_output(init_dict, dict_, x0, flag):
     return x0, crit, warning
 
 
-def check_rslt_parameters(init_dict, data_frame, dict_, x0):
+def check_rslt_parameters(init_dict, data_frame, trace, x0):
     """This function checks if the algorithms has provided a parameterization with a lower criterium
      function value.
      """
     crit = calculate_criteria(init_dict, data_frame, x0)
-    x = min(dict_['crit'], key=dict_['crit'].get)
     if False in np.isfinite(x0).tolist():
         check, flag = True, 'notfinite'
 
-    elif dict_['crit'][str(x)] <= crit:
+    elif trace['best']['crit'] <= crit:
         check, flag = True, 'adjustment'
     else:
         check, flag = False, None
     return check, flag
 
 
-def bfgs_dict():
-    """The function provides a dictionary for tracking the criteria function values and the
-    associated parametrization.
-    """
-    rslt_dict = {'parameter': {}, 'crit': {}}
-    return rslt_dict
-
-
-def adjust_output(opt_rslt, init_dict, x0, data_frame, dict_=None):
+def adjust_output(opt_rslt, init_dict, x0, data_frame, trace=None):
     """The function adds different information of the minimization process to the estimation
     output.
     """
@@ -244,10 +254,10 @@ def adjust_output(opt_rslt, init_dict, x0, data_frame, dict_=None):
 
     else:
         # Check if the algorithm has returned the values with the lowest criterium function value
-        check, flag = check_rslt_parameters(init_dict, data_frame, dict_, x0)
+        check, flag = check_rslt_parameters(init_dict, data_frame, trace, x0)
         # Adjust values if necessary
         if check:
-            x, crit, warning = process_output(init_dict, dict_, x0, flag)
+            x, crit, warning = process_output(init_dict, trace, x0, flag)
             rslt['crit'] = crit
             rslt['warning'] = [warning]
 
@@ -278,21 +288,23 @@ def adjust_output(opt_rslt, init_dict, x0, data_frame, dict_=None):
 
 
 def calculate_se(rslt, init_dict, data_frame):
-    """This function calculates the standard errors for given parameterization via an approximation
-    of the hessian matrix."""
+    """This function calculates the standard errors for given parameterization. Depending on the
+    se_method specified in the ESTIMATION section the calculation is based on the analytical hessian
+    matrix, the outer product of the individual scores, the sandwich estimator or a numerical
+    approximation of the hessian matrix.
+    """
 
-    x0 = rslt['AUX']['x_internal']
+    x0 = np.array(rslt['AUX']['x_internal'])
+    prep = prepare_data(init_dict, data_frame)
 
     if init_dict['ESTIMATION']['maxiter'] == 0:
         rslt['AUX']['standard_errors'] = [np.nan] * len(x0)
         rslt['AUX']['hess_inv'] = '---'
         rslt['AUX']['confidence_intervals'] = [[np.nan, np.nan]] * len(x0)
     else:
-        # Calculate the hessian matrix, check if it is p
-        hess = approx_hess_cs(x0, log_likelihood, args=(init_dict, data_frame))
         try:
-            hess_inv = np.linalg.inv(hess)
-            se = np.sqrt(np.diag(hess_inv) / data_frame.shape[0])
+            hess_inv = calculate_hess_inv(x0, init_dict, prep)
+            se = np.sqrt(np.diag(hess_inv) / prep['num_agents'])
             rslt['AUX']['standard_errors'] = se
             rslt['AUX']['hess_inv'] = hess_inv
             rslt['AUX']['confidence_intervals'] = []
@@ -314,3 +326,26 @@ def calculate_se(rslt, init_dict, data_frame):
                                 'leads to a singular Matrix']
 
     return rslt
+
+
+def calculate_hess_inv(x0, init_dict, prep):
+    """The function returns the asymptotic covariance matrix of the parameters in their original
+    form, scaled by the number of observations, for the se_method specified in the ESTIMATION
+    section.
+    """
+    method = init_dict['ESTIMATION']['se_method']
+
+    if method == 'numerical':
+        hess = approx_hess3(x0, log_likelihood, args=(init_dict, prep))
+        return np.linalg.inv(hess)
+
+    hess, opg = information_matrices(x0, init_dict, prep)
+    if method == 'hessian':
+        hess_inv = np.linalg.inv(hess)
+    elif method == 'opg':
+        hess_inv = np.linalg.inv(opg)
+    else:
+        aux = np.linalg.inv(hess)
+        hess_inv = aux.dot(opg).dot(aux)
+
+    return hess_inv
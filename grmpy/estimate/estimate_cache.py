@@ -0,0 +1,197 @@
+"""The module provides an on-disk cache of estimation results. Each result is stored in the cache
+directory under the fingerprint of the processed specification and the content of the data file,
+so that an identical estimation returns the stored result instead of repeating the optimization.
+The total size of the cache is bounded by evicting the least recently used results, and the
+numbers of hits, misses, stores and evictions are recorded for the statistics of the cache.
+"""
+import hashlib
+import json
+import os
+
+import numpy as np
+
+from grmpy.estimate.estimate_result import save_result
+from grmpy.estimate.estimate_result import load_result
+from grmpy.check.custom_exceptions import UserError
+from grmpy.__version__ import __version__
+
+# Options of the Estimation section that do not affect the estimation result
+CACHE_EXCLUDED = ['file', 'output_file', 'comparison', 'trace', 'trace_file', 'workers',
+                  'chunksize', 'stream', 'processes', 'checkpoint', 'interval', 'cache',
+                  'cache_size', 'warning']
+
+# Content hashes of the recently used files, indexed by their path, size and modification time
+HASHES = dict()
+
+
+def cache_key(init_dict):
+    """The function returns the fingerprint of an estimation, which consists of the processed
+    specification, the seed of the simulation and the content of the data file. Estimations that
+    depend on a checkpoint or a time budget are not cached.
+    """
+    est = init_dict['ESTIMATION']
+    if est['start'] == 'resume' or est['budget'] > 0:
+        return None
+
+    spec = dict()
+    for key_ in ['TREATED', 'UNTREATED', 'CHOICE', 'DIST', 'varnames']:
+        spec[key_] = init_dict[key_]
+    spec['ESTIMATION'] = {key_: est[key_] for key_ in est.keys() if key_ not in CACHE_EXCLUDED}
+    spec['optimizer'] = init_dict.get(est['optimizer'])
+    spec['seed'] = init_dict['SIMULATION']['seed']
+    spec['data'] = file_hash(est['file'])
+    if est['start'] == 'result':
+        spec['start_file'] = file_hash(est['start_file'])
+    spec['version'] = __version__
+
+    def default(content):
+        return content.tolist() if isinstance(content, (np.ndarray, np.generic)) else str(content)
+
+    return hashlib.sha1(json.dumps(spec, sort_keys=True, default=default).encode()).hexdigest()
+
+
+def file_hash(fname):
+    """The function returns the hash of the content of a file. The hash is only computed again if
+    the size or the modification time of the file have changed.
+    """
+    if fname is None or not os.path.isfile(fname):
+        msg = 'The file {} specified in the Estimation section does not exist.'.format(fname)
+        raise UserError(msg)
+
+    stat = os.stat(fname)
+    identity = (os.path.abspath(fname), stat.st_size, stat.st_mtime)
+    if identity not in HASHES.keys():
+        hash_ = hashlib.sha256()
+        with open(fname, 'rb') as file_:
+            for block in iter(lambda: file_.read(2 ** 20), b''):
+                hash_.update(block)
+        HASHES[identity] = hash_.hexdigest()
+
+    return HASHES[identity]
+
+
+def lookup_result(init_dict, key_):
+    """The function returns the cached entry of an estimation, or None if there is no such entry.
+    The entry consists of the result dictionary and the information about the start values that
+    is required for the output files.
+    """
+    directory = init_dict['ESTIMATION']['cache']
+    fname = os.path.join(directory, key_ + '.npz')
+
+    try:
+        entry = load_result(fname, mmap=False)
+    except (UserError, OSError, ValueError, KeyError):
+        entry = None
+
+    if entry is None:
+        update_statistics(directory, misses=1)
+    else:
+        # The modification time of an entry marks its last use for the eviction.
+        os.utime(fname, None)
+        update_statistics(directory, hits=1)
+
+    return entry
+
+
+def store_result(init_dict, key_, entry):
+    """The function adds an entry to the cache and evicts the least recently used entries until
+    the cache fits into its size.
+    """
+    directory = init_dict['ESTIMATION']['cache']
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+
+    save_result(entry, os.path.join(directory, key_ + '.npz'))
+    update_statistics(directory, stores=1)
+
+    entries = sorted(list_entries(directory), key=lambda entry_: entry_['mtime'])
+    size = sum(entry_['size'] for entry_ in entries)
+    num_evictions = 0
+    for entry_ in entries:
+        if size <= init_dict['ESTIMATION']['cache_size'] * 2 ** 20:
+            break
+        os.remove(entry_['fname'])
+        size -= entry_['size']
+        num_evictions += 1
+
+    if num_evictions > 0:
+        update_statistics(directory, evictions=num_evictions)
+
+
+def list_entries(directory):
+    """The function returns the file name, the size and the time of the last use of each entry in
+    the cache directory.
+    """
+    entries = []
+    for fname in os.listdir(directory):
+        if fname.endswith('.npz'):
+            stat = os.stat(os.path.join(directory, fname))
+            entries += [{'fname': os.path.join(directory, fname), 'size': stat.st_size,
+                         'mtime': stat.st_mtime}]
+
+    return entries
+
+
+def update_statistics(directory, **counts):
+    """The function adds to the counts of the cache statistics. The statistics file is replaced
+    atomically, but concurrent updates may get lost.
+    """
+    statistics = read_statistics(directory)
+    for key_, value in counts.items():
+        statistics[key_] += value
+
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+    fname = os.path.join(directory, 'statistics.json')
+    with open(fname + '.{}.tmp'.format(os.getpid()), 'w') as file_:
+        json.dump(statistics, file_)
+    os.replace(fname + '.{}.tmp'.format(os.getpid()), fname)
+
+
+def read_statistics(directory):
+    """The function returns the counts of the cache statistics."""
+    statistics = {'hits': 0, 'misses': 0, 'stores': 0, 'evictions': 0}
+
+    fname = os.path.join(directory, 'statistics.json')
+    if os.path.isfile(fname):
+        with open(fname, 'r') as file_:
+            statistics.update(json.load(file_))
+
+    return statistics
+
+
+def cache_statistics(directory):
+    """The function returns the statistics of the cache in the directory, which are the number
+    and the total size of the entries, the counts of hits, misses, stores and evictions as well
+    as the share of the lookups that are hits.
+    """
+    statistics = read_statistics(directory)
+    entries = list_entries(directory) if os.path.isdir(directory) else []
+
+    statistics['entries'] = len(entries)
+    statistics['size'] = sum(entry_['size'] for entry_ in entries)
+    num_lookups = statistics['hits'] + statistics['misses']
+    statistics['hit_rate'] = statistics['hits'] / num_lookups if num_lookups > 0 else np.nan
+
+    return statistics
+
+
+def cache_report(directory):
+    """The function returns the statistics of the cache in the directory as a formatted report."""
+    statistics = cache_statistics(directory)
+
+    report = '\n  {:<10}\n\n'.format('Cache Statistics')
+    fmt = '  {:<10}' + ' {:<20}' + '{:>20}\n'
+    report += fmt.format('', 'Directory:', directory)
+    for label, key_ in [('Entries:', 'entries'), ('Size (MB):', 'size'), ('Hits:', 'hits'),
+                        ('Misses:', 'misses'), ('Hit rate:', 'hit_rate'),
+                        ('Stores:', 'stores'), ('Evictions:', 'evictions')]:
+        if key_ == 'size':
+            value = '{:.2f}'.format(statistics[key_] / 2 ** 20)
+        elif key_ == 'hit_rate':
+            value = '{:.4f}'.format(statistics[key_])
+        else:
+            value = statistics[key_]
+        report += fmt.format('', label, value)
+
+    return report
@@ -0,0 +1,127 @@
+"""The module provides the checkpoints of long-running estimations. The state of the optimization,
+which consists of the current parameters, the best evaluation so far, the number of iterations and
+evaluations and the state of the random number generator, is written to a JSON file periodically.
+An estimation that is started with the resume option continues from the checkpoint, and a time
+budget stops the optimization cleanly once it is exhausted.
+"""
+import json
+import time
+import os
+
+import numpy as np
+
+from grmpy.check.custom_exceptions import UserError
+
+CHECKPOINT_VERSION = 1
+
+# Status of an optimization that is stopped because its time budget is exhausted
+STATUS_BUDGET = 5
+
+
+class BudgetExhausted(Exception):
+    """The exception stops an optimization whose time budget is exhausted."""
+    pass
+
+
+def create_checkpoint(init_dict, resumed=None):
+    """The function returns the state of the checkpoints for an estimation. The counts of a resumed
+    estimation are continued.
+    """
+    est = init_dict['ESTIMATION']
+
+    checkpoint = dict()
+    checkpoint['fname'] = est.get('checkpoint')
+    checkpoint['interval'], checkpoint['budget'] = est['interval'], est['budget']
+    checkpoint['start'] = checkpoint['written'] = time.time()
+    checkpoint['stage'], checkpoint['nit'] = 0, 0
+    checkpoint['nfev'], checkpoint['elapsed'] = 0, 0.0
+
+    if resumed is not None:
+        for key_ in ['stage', 'nit', 'nfev', 'elapsed']:
+            checkpoint[key_] = resumed[key_]
+
+    return checkpoint
+
+
+def checkpoint_callback(init_dict, checkpoint, trace):
+    """The function returns the callback of the optimizer, which counts the iterations and writes
+    the checkpoint whenever the interval has passed. If the time budget is exhausted, the final
+    checkpoint is written and the optimization is stopped.
+    """
+    def callback(x):
+        checkpoint['x'], checkpoint['nit'] = np.array(x), checkpoint['nit'] + 1
+        now = time.time()
+        if checkpoint['budget'] > 0 and now - checkpoint['start'] >= checkpoint['budget']:
+            write_checkpoint(init_dict, checkpoint, x, trace, 'budget')
+            raise BudgetExhausted
+        elif now - checkpoint['written'] >= checkpoint['interval']:
+            write_checkpoint(init_dict, checkpoint, x, trace, 'running')
+
+    return callback
+
+
+def write_checkpoint(init_dict, checkpoint, x, trace, status):
+    """The function writes the state of the optimization to the checkpoint file. The file is
+    replaced atomically, so that an interruption never leaves a corrupted checkpoint behind.
+    """
+    checkpoint['written'] = time.time()
+    if checkpoint['fname'] is None:
+        return
+
+    best = trace['best']
+    random_state = trace.get('random_state')
+
+    content = dict()
+    content['version'] = CHECKPOINT_VERSION
+    content['optimizer'] = init_dict['ESTIMATION']['optimizer']
+    content['status'] = status
+    content['stage'], content['nit'] = checkpoint['stage'], checkpoint['nit']
+    content['nfev'] = checkpoint['nfev'] + trace['num_evals']
+    content['elapsed'] = checkpoint['elapsed'] + checkpoint['written'] - checkpoint['start']
+    content['x'] = [float(i) for i in x]
+    content['best'] = {'crit': float(best['crit']), 'parameter': None}
+    if best['parameter'] is not None:
+        content['best']['parameter'] = [float(i) for i in best['parameter']]
+    if random_state is not None:
+        name, keys, pos, has_gauss, cached_gaussian = random_state.get_state()
+        content['random_state'] = [name, keys.tolist(), pos, has_gauss, cached_gaussian]
+    else:
+        content['random_state'] = None
+
+    with open(checkpoint['fname'] + '.tmp', 'w') as file_:
+        json.dump(content, file_)
+    os.replace(checkpoint['fname'] + '.tmp', checkpoint['fname'])
+
+
+def read_checkpoint(init_dict):
+    """The function reads the checkpoint of the estimation that is specified in the ESTIMATION
+    section and ensures that it belongs to the same model.
+    """
+    fname = init_dict['ESTIMATION'].get('checkpoint')
+    if fname is None or not os.path.isfile(fname):
+        msg = 'The estimation can not be resumed, because the checkpoint file specified in the ' \
+              'Estimation section does not exist.'
+        raise UserError(msg)
+
+    with open(fname, 'r') as file_:
+        content = json.load(file_)
+
+    if content.get('version') != CHECKPOINT_VERSION or \
+            len(content['x']) != init_dict['AUX']['num_paras']:
+        msg = 'The checkpoint file {} does not belong to the specified model.'.format(fname)
+        raise UserError(msg)
+
+    return content
+
+
+def restore_random_state(content):
+    """The function returns the random number generator of a checkpoint, if there is one."""
+    if content['random_state'] is None:
+        return None
+
+    name, keys, pos, has_gauss, cached_gaussian = content['random_state']
+    random_state = np.random.RandomState()
+    random_state.set_state((name, np.array(keys, dtype=np.uint32), pos, has_gauss,
+                            cached_gaussian))
+
+    return random_state
@@ -0,0 +1,195 @@
+"""The module provides a columnar, memory-mapped cache of the estimation data set. The data file is
+converted once into a directory that contains a .npy file for each column and a small manifest, so
+that the estimation process is able to stream over the agents in blocks of fixed size. In addition,
+the data frames of recently used data files and their splits by treatment status are kept in
+memory for the following estimations.
+"""
+from collections import OrderedDict
+import json
+import os
+
+from numpy.lib.format import open_memmap
+import pandas as pd
+import numpy as np
+
+from grmpy.estimate.estimate_likelihood import split_states
+from grmpy.estimate.estimate_likelihood import prepare_data
+from grmpy.check.custom_exceptions import UserError
+from grmpy.check.auxiliary import read_data
+
+# The data frames and the prepared design matrices of the recently used data files, indexed by
+# the absolute path of the file, and the upper bound for their total size in bytes
+DATA = OrderedDict()
+DATA_MEMORY = 2 ** 30
+
+
+def load_data(init_dict, data_file):
+    """The function returns the data frame of the data file together with the data that is
+    prepared for the likelihood evaluations. Both are kept in memory and reused by the following
+    calls as long as the data file does not change. The data frame is shared between the calls
+    and must not be modified.
+    """
+    source = source_identity(data_file)
+    fname = source['file']
+
+    if fname not in DATA.keys() or DATA[fname]['source'] != source:
+        data = read_data(data_file)
+        nbytes = int(data.memory_usage(index=True, deep=True).sum())
+        DATA[fname] = {'source': source, 'data': data, 'states': OrderedDict(), 'nbytes': nbytes}
+    DATA.move_to_end(fname)
+    entry = DATA[fname]
+
+    # The split by treatment status only depends on the columns that enter the likelihood.
+    key_ = (init_dict['ESTIMATION']['indicator'], init_dict['ESTIMATION']['dependent'])
+    for section in ['TREATED', 'UNTREATED', 'CHOICE']:
+        key_ += (tuple(init_dict['AUX']['labels'][section]),)
+
+    if key_ not in entry['states'].keys():
+        data = entry['data']
+        columns = {label: data[label].values for label in data.columns}
+        entry['states'][key_] = split_states(init_dict, columns, 0, data.shape[0])
+        entry['nbytes'] += states_nbytes(entry['states'][key_])
+    entry['states'].move_to_end(key_)
+
+    evict_data(fname, key_)
+
+    return entry['data'], prepare_data(init_dict, entry['data'], entry['states'][key_])
+
+
+def evict_data(fname, key_):
+    """The function removes the least recently used data from memory until the total size is
+    below the upper bound. The data that is currently in use is never removed.
+    """
+    while sum(entry['nbytes'] for entry in DATA.values()) > DATA_MEMORY:
+        candidates = [label for label in DATA.keys() if label != fname]
+        if candidates:
+            DATA.pop(candidates[0])
+            continue
+
+        entry = DATA[fname]
+        candidates = [label for label in entry['states'].keys() if label != key_]
+        if not candidates:
+            break
+        entry['nbytes'] -= states_nbytes(entry['states'].pop(candidates[0]))
+
+
+def states_nbytes(states):
+    """The function returns the size of the arrays of the data that is split by treatment
+    status.
+    """
+    return sum(array.nbytes for state in states.values() for array in state.values())
+
+
+def invalidate_data(data_file=None):
+    """The function removes the data of the data file from memory, or the data of all files if no
+    file is specified.
+    """
+    if data_file is None:
+        DATA.clear()
+    else:
+        DATA.pop(os.path.abspath(data_file), None)
+
+
+def load_cache(data_file):
+    """The function returns the memory-mapped columns of the cache that is associated with the
+    data file. The cache is created if it does not exist yet or if the data file has changed since
+    its creation.
+    """
+    directory = cache_directory(data_file)
+    manifest = read_manifest(directory)
+    if manifest is None or manifest['source'] != source_identity(data_file):
+        manifest = create_cache(data_file)
+
+    columns = dict()
+    for label, fname in zip(manifest['labels'], manifest['files']):
+        columns[label] = np.load(os.path.join(directory, fname), mmap_mode='r')
+
+    return {'columns': columns, 'labels': manifest['labels'], 'num_agents': manifest['num_agents']}
+
+
+def create_cache(data_file, blocksize=100000):
+    """The function converts the data file into a columnar cache. Text files are processed in
+    blocks, so that they never have to be held in memory as a whole.
+    """
+    directory = cache_directory(data_file)
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+    elif os.path.isfile(os.path.join(directory, 'manifest.json')):
+        os.remove(os.path.join(directory, 'manifest.json'))
+
+    if os.path.splitext(data_file)[1] == '.txt':
+        labels = list(pd.read_table(data_file, delim_whitespace=True, header=0, nrows=0).columns)
+        dtypes = [np.float64] * len(labels)
+        num_agents = count_rows(data_file)
+        chunks = pd.read_table(data_file, delim_whitespace=True, header=0, chunksize=blocksize)
+    else:
+        data = read_data(data_file)
+        labels, dtypes, num_agents = list(data.columns), list(data.dtypes), data.shape[0]
+        chunks = [data]
+
+    for label, dtype in zip(labels, dtypes):
+        if not (np.issubdtype(dtype, np.number) or np.issubdtype(dtype, np.bool_)):
+            msg = 'The column {} of the data file is not numeric and can not be cached.' \
+                .format(label)
+            raise UserError(msg)
+
+    files = ['column_{}.npy'.format(j) for j in range(len(labels))]
+    arrays = []
+    for fname, dtype in zip(files, dtypes):
+        arrays += [open_memmap(os.path.join(directory, fname), mode='w+', dtype=dtype,
+                               shape=(num_agents,))]
+
+    start = 0
+    for chunk in chunks:
+        stop = start + chunk.shape[0]
+        for label, array in zip(labels, arrays):
+            array[start:stop] = chunk[label].values
+        start = stop
+
+    for array in arrays:
+        array.flush()
+
+    # The manifest is written last, an interrupted conversion is therefore never mistaken for a
+    # valid cache.
+    manifest = {'source': source_identity(data_file), 'labels': labels, 'files': files,
+                'num_agents': num_agents}
+    with open(os.path.join(directory, 'manifest.json'), 'w') as file_:
+        json.dump(manifest, file_)
+
+    return manifest
+
+
+def read_cache(cache):
+    """The function returns the content of the cache as a data frame."""
+    columns = cache['columns']
+    return pd.DataFrame({label: np.array(columns[label]) for label in cache['labels']},
+                        columns=cache['labels'])
+
+
+def read_manifest(directory):
+    """The function returns the manifest of the cache in the directory if there is one."""
+    fname = os.path.join(directory, 'manifest.json')
+    if not os.path.isfile(fname):
+        return None
+    with open(fname, 'r') as file_:
+        return json.load(file_)
+
+
+def cache_directory(data_file):
+    """The function returns the name of the cache directory for the data file."""
+    return data_file + '.cache'
+
+
+def source_identity(data_file):
+    """The function returns the information that identifies the current version of the data
+    file.
+    """
+    stat = os.stat(data_file)
+    return {'file': os.path.abspath(data_file), 'size': stat.st_size, 'mtime': stat.st_mtime}
+
+
+def count_rows(data_file):
+    """The function returns the number of agents in a text file."""
+    with open(data_file, 'r') as file_:
+        num_rows = sum(1 for line in file_ if line.strip())
+    return max(num_rows - 1, 0)
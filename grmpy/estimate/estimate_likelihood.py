@@ -0,0 +1,477 @@
+"""The module provides a vectorized implementation of the log-likelihood function of the
+generalized Roy model. The estimation data set is split by treatment status once and the design
+matrices are stored as contiguous NumPy arrays, so that each evaluation of the criterion function
+reduces to a couple of matrix-vector products. Alternatively, the data is streamed in blocks from a
+memory-mapped cache.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from collections import OrderedDict
+from functools import partial
+
+from scipy.special import log_ndtr
+import numpy as np
+
+# The individual likelihood contributions are bounded from below to ensure a finite criterion
+# function value.
+LOG_CLIP = np.log(1e-20)
+LOG_SQRT_2PI = 0.5 * np.log(2.0 * np.pi)
+
+# Thread pools for the evaluation of the shards, indexed by the number of workers
+POOLS = dict()
+
+# Number of evaluations that are memorized for the prepared data of an estimation
+MEMO_SIZE = 16
+
+
+def prepare_data(init_dict, data, states=None):
+    """The function splits the estimation data set by treatment status and returns a dictionary
+    that contains the dependent variable as well as the outcome and choice design matrices for
+    each state as contiguous float64 arrays. The position of each agent in the original data set
+    is kept as well. Already prepared data is returned unchanged, states that were already split
+    are reused.
+    """
+    if isinstance(data, dict):
+        return data
+
+    if states is None:
+        columns = {label: data[label].values for label in data.columns}
+        states = split_states(init_dict, columns, 0, data.shape[0])
+
+    return complete_data(init_dict, states, data.shape[0])
+
+
+def complete_data(init_dict, states, num_agents):
+    """The function adds the shards, the number of workers and an empty memo to the data that is
+    split by treatment status.
+    """
+    prep = dict(states)
+    prep['num_agents'] = num_agents
+    prep['shards'] = distribute_shards(prep, init_dict['ESTIMATION']['chunksize'])
+    prep['workers'] = init_dict['ESTIMATION']['workers']
+    prep['memo'] = OrderedDict()
+
+    return prep
+
+
+def subsample_data(init_dict, prep, agents):
+    """The function returns the prepared data for a subsample of the agents, which is specified by
+    the sorted positions of the agents in the data set. The subsample is held in memory even if the
+    data is streamed from a memory-mapped cache.
+    """
+    if 'cache' in prep.keys():
+        labels = [init_dict['ESTIMATION']['indicator'], init_dict['ESTIMATION']['dependent']]
+        labels += init_dict['AUX']['labels']['OUTCOMES'] + init_dict['AUX']['labels']['CHOICE']
+        columns = {label: np.asarray(prep['cache'][label][agents]) for label in set(labels)}
+        states = split_states(init_dict, columns, 0, agents.shape[0])
+    else:
+        # The agents of each state are located by a binary search, so that the effort only depends
+        # on the size of the subsample.
+        states = dict()
+        for key_ in ['TREATED', 'UNTREATED']:
+            index = prep[key_]['index']
+            if index.shape[0] > 0:
+                rows = np.minimum(np.searchsorted(index, agents), index.shape[0] - 1)
+                is_state = index[rows] == agents
+            else:
+                rows, is_state = np.zeros(agents.shape[0], dtype=int), agents < 0
+            states[key_] = {label: array[rows[is_state]] for label, array in prep[key_].items()}
+            states[key_]['index'] = np.flatnonzero(is_state)
+
+    return complete_data(init_dict, states, agents.shape[0])
+
+
+def prepare_stream(init_dict, cache):
+    """The function prepares the columns of a memory-mapped data cache for the estimation process.
+    Instead of holding the design matrices in memory, the agents are divided into blocks of
+    chunksize rows that are read and split by treatment status during each evaluation.
+    """
+    num_agents = cache['num_agents']
+    step = init_dict['ESTIMATION']['chunksize']
+    if step == 0:
+        step = max(num_agents, 1)
+
+    prep = dict()
+    prep['num_agents'] = num_agents
+    prep['cache'] = cache['columns']
+    prep['shards'] = [(start, min(start + step, num_agents))
+                      for start in range(0, max(num_agents, 1), step)]
+    prep['workers'] = init_dict['ESTIMATION']['workers']
+    prep['memo'] = OrderedDict()
+
+    return prep
+
+
+def split_states(init_dict, columns, start, stop):
+    """The function selects the agents between start and stop from the columns of the estimation
+    data set and returns the dependent variable, the outcome and the choice design matrices for
+    each treatment state.
+    """
+    indicator = init_dict['ESTIMATION']['indicator']
+    dep = init_dict['ESTIMATION']['dependent']
+    labels_choice = init_dict['AUX']['labels']['CHOICE']
+
+    D = np.asarray(columns[indicator][start:stop])
+    states = dict()
+    for key_, state in [('TREATED', 1.0), ('UNTREATED', 0.0)]:
+        labels = init_dict['AUX']['labels'][key_]
+        is_state = D == state
+        states[key_] = {}
+        states[key_]['index'] = start + np.flatnonzero(is_state)
+        states[key_]['Y'] = as_float_array(columns[dep][start:stop][is_state])
+        states[key_]['X'] = stack_columns(columns, labels, start, stop, is_state)
+        states[key_]['Z'] = stack_columns(columns, labels_choice, start, stop, is_state)
+
+    return states
+
+
+def stack_columns(columns, labels, start, stop, is_state):
+    """The function returns the selected rows of the specified columns as a contiguous float64
+    matrix.
+    """
+    matrix = np.empty((np.count_nonzero(is_state), len(labels)))
+    for j, label in enumerate(labels):
+        matrix[:, j] = columns[label][start:stop][is_state]
+
+    return matrix
+
+
+def as_float_array(array):
+    """The function returns a C-contiguous float64 copy of the input array."""
+    return np.ascontiguousarray(array, dtype=np.float64)
+
+
+def distribute_parameters(x0, init_dict):
+    """The function splits the parameter vector into the coefficients of both treatment states,
+    the choice coefficients and the distributional parameters.
+    """
+    num_treated = init_dict['AUX']['num_covars_treated']
+    num_untreated = num_treated + init_dict['AUX']['num_covars_untreated']
+
+    para = dict()
+    para['TREATED'] = {'beta': x0[:num_treated], 'sd': x0[-4], 'rho': x0[-3]}
+    para['UNTREATED'] = {'beta': x0[num_treated:num_untreated], 'sd': x0[-2], 'rho': x0[-1]}
+    para['gamma'] = x0[num_untreated:-4]
+    return para
+
+
+def state_log_likelihood(data, beta, gamma, sd, rho, key_):
+    """The function returns the individual log-likelihood contributions of all agents in the
+    specified treatment state.
+    """
+    e = (data['Y'] - data['X'].dot(beta)) / sd
+    v = (data['Z'].dot(gamma) - rho * e) / np.sqrt(1.0 - rho ** 2)
+    if key_ == 'UNTREATED':
+        v = -v
+    contrib = -np.log(sd) - LOG_SQRT_2PI - 0.5 * e ** 2 + log_ndtr(v)
+    return np.maximum(contrib, LOG_CLIP)
+
+
+def state_derivatives(data, beta, gamma, sd, rho, key_, second=False):
+    """The function returns the individual log-likelihood contributions of all agents in the
+    specified treatment state together with the auxiliary terms that determine their derivatives.
+    The derivatives with respect to beta and gamma follow from multiplying the terms with the rows
+    of X and Z respectively. Contributions that are bounded from below have a zero derivative. If
+    requested, the terms for the second derivatives are provided as well.
+    """
+    sign = 1.0 if key_ == 'TREATED' else -1.0
+    r = np.sqrt(1.0 - rho ** 2)
+
+    choice = data['Z'].dot(gamma)
+    e = (data['Y'] - data['X'].dot(beta)) / sd
+    w = sign * (choice - rho * e) / r
+
+    log_cdf = log_ndtr(w)
+    contrib = -np.log(sd) - LOG_SQRT_2PI - 0.5 * e ** 2 + log_cdf
+    is_active = contrib > LOG_CLIP
+
+    # The inverse Mills ratio is evaluated in logs to remain stable in the tails.
+    mills = sign * np.exp(-LOG_SQRT_2PI - 0.5 * w ** 2 - log_cdf) * is_active
+    aux = (e + mills * rho / r) * is_active
+
+    terms = dict()
+    terms['beta'] = aux / sd
+    terms['gamma'] = mills / r
+    terms['sd'] = (e * aux - is_active) / sd
+    terms['rho'] = mills * (rho * choice - e) / r ** 3
+
+    if second:
+        # Second derivative of the log normal cdf with respect to its argument
+        kappa = - sign * mills * (w + sign * mills)
+        dev = rho * choice - e
+        cross = kappa * rho * dev / r + mills
+
+        terms['beta_beta'] = (kappa * rho ** 2 / r ** 2 - is_active) / sd ** 2
+        terms['beta_gamma'] = kappa * rho / (sd * r ** 2)
+        terms['beta_sd'] = (kappa * rho ** 2 * e / r ** 2 - 2 * e - mills * rho / r) / sd ** 2 \
+            * is_active
+        terms['beta_rho'] = cross / (sd * r ** 3)
+        terms['gamma_gamma'] = kappa / r ** 2
+        terms['gamma_sd'] = kappa * rho * e / (sd * r ** 2)
+        terms['gamma_rho'] = (kappa * dev / r + mills * rho) / r ** 3
+        curv = kappa * (rho * e / r) ** 2 - 2 * mills * rho * e / r
+        terms['sd_sd'] = (is_active - 3 * e ** 2 + curv) / sd ** 2 * is_active
+        terms['sd_rho'] = e * cross / (sd * r ** 3)
+        terms['rho_rho'] = kappa * dev ** 2 / r ** 6 + \
+            mills * (choice * r ** 2 + 3 * rho * dev) / r ** 5
+
+    return np.maximum(contrib, LOG_CLIP), terms
+
+
+def state_indices(init_dict, key_):
+    """The function returns the positions of the parameters that affect the likelihood
+    contributions of the specified treatment state in the overall parameter vector.
+    """
+    num_treated = init_dict['AUX']['num_covars_treated']
+    num_untreated = num_treated + init_dict['AUX']['num_covars_untreated']
+    num_paras = init_dict['AUX']['num_paras']
+
+    if key_ == 'TREATED':
+        beta, dist = list(range(num_treated)), [num_paras - 4, num_paras - 3]
+    else:
+        beta, dist = list(range(num_treated, num_untreated)), [num_paras - 2, num_paras - 1]
+    gamma = list(range(num_untreated, num_paras - 4))
+
+    return np.array(beta + gamma + dist)
+
+
+def state_scores(data, terms):
+    """The function returns the matrix of the individual scores of the log-likelihood contributions
+    with respect to the parameters of the specified treatment state.
+    """
+    return np.column_stack((data['X'] * terms['beta'][:, None],
+                            data['Z'] * terms['gamma'][:, None], terms['sd'], terms['rho']))
+
+
+def state_hessian(data, terms):
+    """The function returns the sum of the individual hessian matrices of the log-likelihood
+    contributions with respect to the parameters of the specified treatment state.
+    """
+    X, Z = data['X'], data['Z']
+    num_x, num_z = X.shape[1], Z.shape[1]
+    x_, z_, sd_, rho_ = slice(0, num_x), slice(num_x, num_x + num_z), -2, -1
+
+    hess = np.zeros((num_x + num_z + 2, num_x + num_z + 2))
+    hess[x_, x_] = X.T.dot(X * terms['beta_beta'][:, None])
+    hess[x_, z_] = X.T.dot(Z * terms['beta_gamma'][:, None])
+    hess[x_, sd_] = X.T.dot(terms['beta_sd'])
+    hess[x_, rho_] = X.T.dot(terms['beta_rho'])
+    hess[z_, z_] = Z.T.dot(Z * terms['gamma_gamma'][:, None])
+    hess[z_, sd_] = Z.T.dot(terms['gamma_sd'])
+    hess[z_, rho_] = Z.T.dot(terms['gamma_rho'])
+    hess[sd_, sd_] = np.sum(terms['sd_sd'])
+    hess[sd_, rho_] = np.sum(terms['sd_rho'])
+    hess[rho_, rho_] = np.sum(terms['rho_rho'])
+
+    # The upper triangle determines the whole matrix.
+    hess = np.triu(hess) + np.triu(hess, 1).T
+    return hess
+
+
+def criterion(x0, init_dict, prep):
+    """The function returns the negative mean log-likelihood for the given parameterization."""
+    key_ = memo_key('criterion', x0)
+    if key_ in prep.get('memo', {}).keys():
+        return recall(prep, key_)
+
+    para = distribute_parameters(x0, init_dict)
+    likl, num_obs = reduce_shards(map_shards(shard_criterion, para, init_dict, prep))
+
+    return memorize(prep, key_, - likl / num_obs)
+
+
+def gradient(x0, init_dict, prep):
+    """The function returns the gradient of the negative mean log-likelihood with respect to the
+    parameters in their original form. The criterion function value follows from the same pass
+    over the data and is memorized as well.
+    """
+    key_ = memo_key('gradient', x0)
+    if key_ in prep.get('memo', {}).keys():
+        return recall(prep, key_).copy()
+
+    para = distribute_parameters(x0, init_dict)
+    grad, likl, num_obs = reduce_shards(map_shards(shard_gradient, para, init_dict, prep))
+    memorize(prep, memo_key('criterion', x0), - likl / num_obs)
+
+    return memorize(prep, key_, - grad / num_obs).copy()
+
+
+def information_matrices(x0, init_dict, prep):
+    """The function returns the hessian matrix of the negative mean log-likelihood and the mean
+    outer product of the individual scores with respect to the parameters in their original form.
+    Both matrices are computed within a single pass over the data.
+    """
+    key_ = memo_key('information', x0)
+    if key_ in prep.get('memo', {}).keys():
+        hess, opg = recall(prep, key_)
+        return hess.copy(), opg.copy()
+
+    para = distribute_parameters(x0, init_dict)
+    hess, opg, num_obs = reduce_shards(map_shards(shard_information, para, init_dict, prep))
+    hess, opg = memorize(prep, key_, (- hess / num_obs, opg / num_obs))
+
+    return hess.copy(), opg.copy()
+
+
+def memo_key(label, x0):
+    """The function returns the key of an evaluation in the memo of the prepared data, which
+    consists of the kind of the evaluation and the bytes of the parameter vector.
+    """
+    return label, np.asarray(x0, dtype=np.float64).tobytes()
+
+
+def recall(prep, key_):
+    """The function returns a memorized evaluation and marks it as recently used."""
+    prep['memo'].move_to_end(key_)
+    return prep['memo'][key_]
+
+
+def memorize(prep, key_, value):
+    """The function adds an evaluation to the memo of the prepared data and removes the least
+    recently used evaluations beyond MEMO_SIZE. Prepared data without a memo is left unchanged.
+    The memo is bound to the prepared data of a single estimation and its specification.
+    """
+    if 'memo' in prep.keys():
+        prep['memo'][key_] = value
+        while len(prep['memo']) > MEMO_SIZE:
+            prep['memo'].popitem(last=False)
+
+    return value
+
+
+def individual_contributions(x0, init_dict, prep):
+    """The function returns the individual log-likelihood contributions and the matrix of the
+    individual scores with respect to the parameters in their original form. Both arrays are
+    ordered as the agents in the original data set and computed within a single pass over the
+    data. Agents without a valid treatment indicator have a missing contribution.
+    """
+    para = distribute_parameters(x0, init_dict)
+    num_agents, num_paras = prep['num_agents'], init_dict['AUX']['num_paras']
+
+    contrib = np.full(num_agents, np.nan)
+    scores = np.zeros((num_agents, num_paras))
+    map_shards(partial(shard_contributions, out=(contrib, scores)), para, init_dict, prep)
+
+    return contrib, scores
+
+
+def shard_criterion(para, init_dict, key_, data):
+    """The function returns the sum of the log-likelihood contributions within a shard and the
+    number of agents it contains.
+    """
+    contrib = state_log_likelihood(
+        data, para[key_]['beta'], para['gamma'], para[key_]['sd'], para[key_]['rho'], key_)
+
+    return np.sum(contrib), contrib.shape[0]
+
+
+def shard_gradient(para, init_dict, key_, data):
+    """The function returns the sum of the individual scores and the sum of the log-likelihood
+    contributions within a shard as well as the number of agents it contains.
+    """
+    contrib, terms = state_derivatives(
+        data, para[key_]['beta'], para['gamma'], para[key_]['sd'], para[key_]['rho'], key_)
+
+    grad = np.zeros(init_dict['AUX']['num_paras'])
+    grad[state_indices(init_dict, key_)] = np.concatenate((
+        data['X'].T.dot(terms['beta']), data['Z'].T.dot(terms['gamma']),
+        [np.sum(terms['sd']), np.sum(terms['rho'])]))
+
+    return grad, np.sum(contrib), data['Y'].shape[0]
+
+
+def shard_information(para, init_dict, key_, data):
+    """The function returns the sum of the individual hessian matrices and the sum of the outer
+    products of the individual scores within a shard as well as the number of agents it contains.
+    """
+    num_paras = init_dict['AUX']['num_paras']
+    _, terms = state_derivatives(
+        data, para[key_]['beta'], para['gamma'], para[key_]['sd'], para[key_]['rho'], key_, True)
+
+    hess, opg = np.zeros((num_paras, num_paras)), np.zeros((num_paras, num_paras))
+    indices = np.ix_(state_indices(init_dict, key_), state_indices(init_dict, key_))
+    scores = state_scores(data, terms)
+    hess[indices] = state_hessian(data, terms)
+    opg[indices] = scores.T.dot(scores)
+
+    return hess, opg, data['Y'].shape[0]
+
+
+def shard_contributions(para, init_dict, key_, data, out):
+    """The function writes the individual log-likelihood contributions and scores of the agents
+    within a shard to the rows of the preallocated output arrays.
+    """
+    contrib, scores = out
+    state_contrib, terms = state_derivatives(
+        data, para[key_]['beta'], para['gamma'], para[key_]['sd'], para[key_]['rho'], key_)
+
+    contrib[data['index']] = state_contrib
+    scores[np.ix_(data['index'], state_indices(init_dict, key_))] = state_scores(data, terms)
+
+
+def distribute_shards(prep, chunksize):
+    """The function splits the prepared data of each treatment state into shards of at most
+    chunksize agents. The shards are views on the prepared arrays and their layout only depends on
+    the chunksize, a value of zero keeps each treatment state as a single shard.
+    """
+    shards = []
+    for key_ in ['UNTREATED', 'TREATED']:
+        num_obs = prep[key_]['Y'].shape[0]
+        step = chunksize if chunksize > 0 else max(num_obs, 1)
+        for start in range(0, max(num_obs, 1), step):
+            shard = {label: array[start:start + step] for label, array in prep[key_].items()}
+            shards += [(key_, shard)]
+
+    return shards
+
+
+def map_shards(func, para, init_dict, prep):
+    """The function evaluates the function for all shards of the prepared data and returns the
+    results in the order of the shards. If more than one worker is requested, the shards are
+    evaluated by a persistent pool of threads that share the prepared arrays.
+    """
+    shards, workers = prep['shards'], prep['workers']
+
+    def evaluate(shard):
+        states = load_shard(init_dict, prep, shard)
+        return [func(para, init_dict, key_, data) for key_, data in states]
+
+    if workers > 1 and len(shards) > 1:
+        pool = get_pool(workers)
+        rslt = list(pool.map(evaluate, shards))
+    else:
+        rslt = [evaluate(shard) for shard in shards]
+
+    return [partial_ for shard_rslt in rslt for partial_ in shard_rslt]
+
+
+def load_shard(init_dict, prep, shard):
+    """The function returns the treatment states and the associated data of a shard. Shards of a
+    memory-mapped data cache are read and split by treatment status on demand.
+    """
+    if 'cache' in prep.keys():
+        start, stop = shard
+        states = split_states(init_dict, prep['cache'], start, stop)
+        return [(key_, states[key_]) for key_ in ['UNTREATED', 'TREATED']]
+    else:
+        return [shard]
+
+
+def reduce_shards(rslt):
+    """The function adds up the results of all shards. The summation always follows the order of
+    the shards, so that the outcome does not depend on the number of workers.
+    """
+    total = list(rslt[0])
+    for shard_rslt in rslt[1:]:
+        total = [a + b for a, b in zip(total, shard_rslt)]
+
+    return total
+
+
+def get_pool(workers):
+    """The function returns the thread pool for the requested number of workers. The pools are
+    created once and reused across all evaluations.
+    """
+    if workers not in POOLS.keys():
+        POOLS[workers] = ThreadPoolExecutor(max_workers=workers)
+
+    return POOLS[workers]
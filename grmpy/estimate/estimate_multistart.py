@@ -0,0 +1,117 @@
+"""The module provides the screening of several start values for the estimation process. The
+likelihood function is not concave in the correlation parameters, so the optimizer may end in a
+local optimum. Therefore the start values are perturbed randomly and the resulting starts are
+optimized concurrently by a pool of processes. Every few iterations each start publishes its best
+criterion function value and is abandoned if it trails the best start by more than a margin.
+"""
+import multiprocessing
+import os
+
+import numpy as np
+
+from grmpy.estimate.estimate_auxiliary import backward_transformation
+from grmpy.estimate.estimate_optimizers import optimize
+from grmpy.estimate.estimate_auxiliary import log_likelihood
+from grmpy.estimate.estimate_likelihood import POOLS
+from grmpy.estimate.estimate_trace import create_trace
+
+# The specification, the prepared data and the shared criterion function values of the starts
+# within each process of the pool
+PROCESS = dict()
+
+
+class AbandonStart(Exception):
+    """The exception stops the optimization of a start that trails the best start."""
+    pass
+
+
+def screen_starts(init_dict, prep, x0):
+    """The function optimizes a number of starts around the start values x0 and returns the
+    parameterization of the best start as well as a summary of each start. The result of the
+    screening is the start of the subsequent estimation.
+    """
+    est = init_dict['ESTIMATION']
+    starts = draw_starts(init_dict, x0)
+
+    # The current criterion function values of all starts are shared by the processes.
+    crit = multiprocessing.Array('d', [np.inf] * est['starts'])
+    processes = est['processes'] if est['processes'] > 0 else os.cpu_count() or 1
+
+    pool = multiprocessing.Pool(min(processes, est['starts']), initialize_process,
+                                (init_dict, prep, crit))
+    try:
+        summary = pool.map(optimize_start, list(enumerate(starts)), chunksize=1)
+    finally:
+        pool.terminate()
+        pool.join()
+
+    winner = int(np.argmin([start['crit'] for start in summary]))
+    summary[winner]['status'] = 'selected'
+    x0 = summary[winner]['x']
+    for start in summary:
+        del start['x']
+
+    return x0, summary
+
+
+def draw_starts(init_dict, x0):
+    """The function returns the start values x0 and randomly perturbed copies of them. The
+    perturbations are normally distributed with a standard deviation of spread times the absolute
+    value of each transformed parameter, but at least spread. The seed of the simulation
+    determines the perturbations.
+    """
+    est = init_dict['ESTIMATION']
+    random_state = np.random.RandomState(init_dict['SIMULATION']['seed'])
+
+    scale = est['spread'] * np.maximum(np.abs(x0), 1.0)
+    starts = x0 + scale * random_state.standard_normal((est['starts'], x0.shape[0]))
+    starts[0] = x0
+
+    return starts
+
+
+def initialize_process(init_dict, prep, crit):
+    """The function provides the specification, the prepared data and the shared criterion
+    function values to a process of the pool. The thread pools of the parent process are not
+    available in a forked process.
+    """
+    POOLS.clear()
+    PROCESS['init_dict'], PROCESS['prep'], PROCESS['crit'] = init_dict, prep, crit
+
+
+def optimize_start(args):
+    """The function optimizes a start until the optimizer terminates or the start is abandoned.
+    After every rounds iterations, the best criterion function value of the iterates of the start
+    is compared to the best value of all starts so far. An abandoned start reports its best iterate.
+    """
+    i, x0 = args
+    init_dict, prep, crit = PROCESS['init_dict'], PROCESS['prep'], PROCESS['crit']
+    rounds, margin = init_dict['ESTIMATION']['rounds'], init_dict['ESTIMATION']['margin']
+
+    trace = create_trace(init_dict['AUX']['num_paras'], 1)
+    state = {'x': x0, 'crit': np.inf, 'nit': 0}
+
+    def callback(x):
+        state['nit'] += 1
+        # The criterion function value of the iterate is usually recalled from the memo.
+        fun = log_likelihood(backward_transformation(np.array(x)), init_dict, prep)
+        if fun < state['crit']:
+            state['x'], state['crit'] = np.array(x), fun
+        if state['nit'] % rounds == 0:
+            crit[i] = state['crit']
+            if crit[i] > min(crit[:]) + margin:
+                raise AbandonStart
+
+    try:
+        opt_rslt = optimize(x0, init_dict, prep, trace, callback)
+        x, fun = opt_rslt['x'], opt_rslt['fun']
+        status = 'converged' if opt_rslt['success'] else 'stopped'
+    except AbandonStart:
+        x, fun, status = state['x'], state['crit'], 'abandoned'
+
+    if not np.isfinite(fun) or not np.all(np.isfinite(x)):
+        x, fun = x0, np.inf
+    crit[i] = fun
+
+    return {'x': x, 'crit': fun, 'nit': state['nit'], 'nfev': trace['num_evals'],
+            'status': status}
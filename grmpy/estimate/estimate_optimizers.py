@@ -0,0 +1,145 @@
+"""The module provides the optimizers of the estimation process. Besides the optimizers of SciPy,
+Newton's method and the BHHH algorithm use the analytical second derivatives of the likelihood
+function and the outer product of the individual scores respectively. A stochastic optimizer is
+available for large samples, which follows the scores of small random batches of agents instead of
+evaluating the likelihood function for the whole sample.
+"""
+from scipy.optimize import OptimizeResult
+from scipy.optimize import minimize
+import numpy as np
+
+from grmpy.estimate.estimate_auxiliary import minimizing_interface
+from grmpy.estimate.estimate_auxiliary import gradient_interface
+from grmpy.estimate.estimate_auxiliary import hessian_interface
+from grmpy.estimate.estimate_auxiliary import optimizer_options
+from grmpy.estimate.estimate_likelihood import subsample_data
+
+
+def optimize(x0, init_dict, prep, trace, callback=None):
+    """The function minimizes the criterion function for the prepared data with the optimizer that
+    is specified in the ESTIMATION section, starting from the transformed parameters x0. The
+    callback is called with the current parameters after each iteration.
+    """
+    opts, method = optimizer_options(init_dict)
+
+    if method == 'ADAM':
+        return minimize_adam(x0, init_dict, prep, trace, opts, callback)
+    elif method in ['NEWTON', 'BHHH']:
+        return minimize_newton(x0, init_dict, prep, trace, opts, method, callback)
+
+    jac = gradient_interface if method in ['BFGS', 'TRUST-NCG', 'TRUST-EXACT'] else None
+    hess = hessian_interface if method in ['TRUST-NCG', 'TRUST-EXACT'] else None
+    return minimize(minimizing_interface, x0, args=(init_dict, prep, trace), method=method,
+                    jac=jac, hess=hess, callback=callback, options=opts)
+
+
+def minimize_newton(x0, init_dict, prep, trace, opts, method, callback=None, armijo=1e-4):
+    """The function minimizes the criterion function by Newton's method or the BHHH algorithm,
+    which replaces the hessian matrix by the outer product of the individual scores. Matrices that
+    are not positive definite are regularized by adding a multiple of the identity matrix. The
+    length of each step is determined by a backtracking line search. The minimization terminates
+    successfully as soon as the largest absolute value of the gradient is below gtol.
+    """
+    kind = 'opg' if method == 'BHHH' else 'hessian'
+
+    x = np.array(x0, dtype=np.float64)
+    fun, nfev = minimizing_interface(x, init_dict, prep, trace), 1
+    status, message = 1, 'Maximum number of iterations has been exceeded.'
+
+    for nit in range(opts['maxiter'] + 1):
+        grad = gradient_interface(x, init_dict, prep)
+        if np.max(np.abs(grad)) < opts['gtol']:
+            status, message = 0, 'Optimization terminated successfully.'
+            break
+        elif nit == opts['maxiter'] or not np.all(np.isfinite(grad)):
+            break
+
+        hess = hessian_interface(x, init_dict, prep, kind=kind)
+        if not np.all(np.isfinite(hess)):
+            break
+        step = newton_step(hess, grad)
+
+        alpha, slope = 1.0, grad.dot(step)
+        while alpha > 1e-10:
+            candidate = x - alpha * step
+            fun_candidate = minimizing_interface(candidate, init_dict, prep, trace)
+            nfev += 1
+            if fun_candidate <= fun - armijo * alpha * slope:
+                break
+            alpha /= 2.0
+        else:
+            status, message = 2, 'Desired error not necessarily achieved due to precision loss.'
+            break
+
+        x, fun = candidate, fun_candidate
+        if callback is not None:
+            callback(x)
+
+    return OptimizeResult(x=x, fun=fun, jac=grad, success=(status == 0), status=status,
+                          message=message, nfev=nfev, nit=nit)
+
+
+def newton_step(hess, grad):
+    """The function solves the Newton equations for the step. If the matrix is not positive
+    definite, a multiple of the identity matrix is added until its Cholesky factorization exists,
+    which ensures that the step is a descent direction. As a last resort, the step follows the
+    scaled gradient.
+    """
+    shift, scale = 0.0, max(np.max(np.abs(np.diag(hess))), 1.0)
+    for _ in range(100):
+        try:
+            factor = np.linalg.cholesky(hess + shift * np.identity(hess.shape[0]))
+            return np.linalg.solve(factor.T, np.linalg.solve(factor, grad))
+        except np.linalg.LinAlgError:
+            shift = max(2.0 * shift, 1e-8 * scale)
+
+    return grad / scale
+
+
+def minimize_adam(x0, init_dict, prep, trace, opts, callback=None, beta1=0.9, beta2=0.999,
+                  eps=1e-8):
+    """The function minimizes the criterion function by the Adam algorithm of Kingma and Ba (2015).
+    Each of the maxiter iterations follows the gradient for a batch of agents, which are drawn
+    without replacement until all agents have been used once. The learning rate decays with the
+    number of iterations as rate / (1 + decay * t). Afterwards, the result is refined by a number
+    of BFGS iterations on the whole sample. The number of evaluations includes the iterations
+    with a batch of agents. The random number generator is kept in the trace, so that it is
+    available for the checkpoints of the estimation.
+    """
+    num_agents = prep['num_agents']
+    batch = min(opts['batch'], num_agents)
+    random_state = trace.setdefault('random_state',
+                                    np.random.RandomState(init_dict['SIMULATION']['seed']))
+
+    x = np.array(x0, dtype=np.float64)
+    m, v = np.zeros(x.shape[0]), np.zeros(x.shape[0])
+    agents = np.zeros(0, dtype=int)
+    for t in range(1, opts['maxiter'] + 1):
+        if agents.shape[0] < batch:
+            agents = random_state.permutation(num_agents)
+        batch_agents, agents = np.sort(agents[:batch]), agents[batch:]
+
+        grad = gradient_interface(x, init_dict, subsample_data(init_dict, prep, batch_agents))
+        if not np.all(np.isfinite(grad)):
+            continue
+
+        m = beta1 * m + (1.0 - beta1) * grad
+        v = beta2 * v + (1.0 - beta2) * grad ** 2
+        rate = opts['rate'] / (1.0 + opts['decay'] * (t - 1))
+        x -= rate * (m / (1.0 - beta1 ** t)) / (np.sqrt(v / (1.0 - beta2 ** t)) + eps)
+        if callback is not None:
+            callback(x)
+
+    if opts['refine'] > 0:
+        rslt = minimize(minimizing_interface, x, args=(init_dict, prep, trace), method='BFGS',
+                        jac=gradient_interface, callback=callback,
+                        options={'maxiter': opts['refine']})
+    else:
+        fun = minimizing_interface(x, init_dict, prep, trace)
+        rslt = OptimizeResult(x=x, fun=fun, success=True, status=0, nfev=1, nit=0,
+                              message='Maximum number of batch iterations has been reached.')
+
+    rslt['nfev'] += opts['maxiter']
+    rslt['nit'] += opts['maxiter']
+
+    return rslt
@@ -6,6 +6,7 @@ import math
 from grmpy.simulate.simulate_auxiliary import simulate_unobservables
 from grmpy.simulate.simulate_auxiliary import simulate_covariates
 from grmpy.simulate.simulate_auxiliary import simulate_outcomes
+from grmpy.simulate.simulate_auxiliary import random_streams
 from grmpy.simulate.simulate_auxiliary import mte_information
 
 
@@ -19,9 +20,15 @@ def print_logfile(init_dict, rslt):
     else:
         file_name = 'est.grmpy.info'
 
+    labels = ['Optimization Information', 'Criterion Function', 'Economic Parameters']
+    if len(rslt.get('stages', [])) > 1:
+        labels.insert(1, 'Estimation Stages')
+    if len(rslt.get('starts', [])) > 1:
+        labels.insert(1, 'Estimation Starts')
+
     with open(file_name, 'w') as file_:
 
-        for label in ['Optimization Information', 'Criterion Function', 'Economic Parameters']:
+        for label in labels:
             header = '\n \n  {:<10}\n\n'.format(label)
             file_.write(header)
             if label == 'Optimization Information':
@@ -69,6 +76,23 @@ def print_logfile(init_dict, rslt):
                     else:
                         fmt += '  {:>20}\n'
                         file_.write(fmt.format('', section + ':', rslt[section.lower()]))
+            elif label == 'Estimation Stages':
+                fmt = '  {:<10}' + '{:>10}' * 2 + '{:>15}' * 3 + '\n'
+                file_.write(fmt.format('', 'Stage', 'Share', 'Agents', 'Evaluations', 'Time'))
+                fmt = '\n  {:<10}' + '{:>10}' + '{:>10.4f}' + '{:>15}' * 2 + '{:>15.2f}'
+                for counter, stage in enumerate(rslt['stages']):
+                    file_.write(fmt.format('', counter + 1, stage['share'], stage['agents'],
+                                           stage['nfev'], stage['time']))
+                file_.write('\n')
+            elif label == 'Estimation Starts':
+                fmt = '  {:<10}' + '{:>10}' + '{:>20}' + '{:>15}' * 3 + '\n'
+                file_.write(fmt.format('', 'Start', 'Criterion', 'Iterations', 'Evaluations',
+                                       'Status'))
+                fmt = '\n  {:<10}' + '{:>10}' + '{:>20.8f}' + '{:>15}' * 3
+                for counter, start in enumerate(rslt['starts']):
+                    file_.write(fmt.format('', counter + 1, start['crit'], start['nit'],
+                                           start['nfev'], start['status']))
+                file_.write('\n')
             elif label == 'Criterion Function':
                 fmt = '  {:<10}' * 2 + ' {:>20}' * 2 + '\n\n'
                 file_.write(fmt.format('', '', 'Start', 'Finish'))
@@ -95,9 +119,9 @@ def write_identifier_section(init_dict, rslt, auxiliary, file_):
     num_untreated = num_treated + len(init_dict['UNTREATED']['order'])
     num_choice = num_untreated + len(init_dict['CHOICE']['order'])
 
-    identifier_treated = [init_dict['varnames'][j - 1] for j in init_dict['TREATED']['order']]
-    identifier_untreated = [init_dict['varnames'][j - 1] for j in init_dict['UNTREATED']['order']]
-    identifier_choice = [init_dict['varnames'][j - 1] for j in init_dict['CHOICE']['order']]
+    identifier_treated = init_dict['AUX']['labels']['TREATED']
+    identifier_untreated = init_dict['AUX']['labels']['UNTREATED']
+    identifier_choice = init_dict['AUX']['labels']['CHOICE']
     identifier_distribution = ['sigma1', 'rho1', 'sigma0', 'rho0']
     identifier = \
         identifier_treated + identifier_untreated + identifier_choice + identifier_distribution
@@ -214,7 +238,6 @@ def simulate_estimation(init_dict, rslt, start=False):
     """The function simulates a new sample based on the estimated coefficients."""
 
     # Distribute information
-    seed = init_dict['SIMULATION']['seed']
     labels = init_dict['varnames']
     # Determine parametrization and read in /simulate observables
     if start:
@@ -227,11 +250,11 @@ def simulate_estimation(init_dict, rslt, start=False):
     data_frames = []
     for dict_ in dicts:
 
-        # Set seed value
-        np.random.seed(seed)
+        # Each sample is drawn from freshly seeded random number generators
+        streams = random_streams(init_dict)
         # Simulate unobservables
-        U, V = simulate_unobservables(dict_)
-        X = simulate_covariates(rslt_dict)
+        U, V = simulate_unobservables(dict_, streams)
+        X = simulate_covariates(rslt_dict, streams)
 
         # Simulate endogeneous variables
         Y, D, Y_1, Y_0 = simulate_outcomes(dict_, X, U, V)
@@ -302,8 +325,7 @@ def calculate_mte(rslt, init_dict, data_frame, quant=None):
     cov[2, 0] = rslt['AUX']['x_internal'][-3] * rslt['AUX']['x_internal'][-4]
     cov[2, 1] = rslt['AUX']['x_internal'][-1] * rslt['AUX']['x_internal'][-2]
     cov[2, 2] = 1.0
-    help_ = list(set(init_dict['TREATED']['order'] + init_dict['UNTREATED']['order']))
-    x = data_frame[[init_dict['varnames'][i - 1] for i in help_]]
+    x = data_frame[init_dict['AUX']['labels']['OUTCOMES']]
 
     value = mte_information(coeffs_treated, coeffs_untreated, cov, quantiles, x, rslt)
     if quant is None:
@@ -0,0 +1,122 @@
+"""The module provides the serialization of estimation results. A result is saved as an uncompressed
+npz archive, which contains each array of the result as a separate npy file and a JSON header with
+the remaining content, the format version and the version of grmpy. As the archive is not
+compressed, large arrays such as the covariance matrix are memory-mapped when the result is loaded
+instead of being read at once.
+"""
+import zipfile
+import json
+import io
+import os
+
+from numpy.lib import format as npy_format
+import numpy as np
+
+from grmpy.check.custom_exceptions import UserError
+from grmpy.__version__ import __version__
+
+RESULT_VERSION = 1
+
+# Arrays of at least this number of bytes are memory-mapped by load_result
+MMAP_SIZE = 2 ** 16
+
+
+def save_result(rslt, fname):
+    """The function saves an estimation result in the archive fname. The archive is replaced
+    atomically.
+    """
+    arrays = dict()
+    header = dict()
+    header['format'], header['version'], header['grmpy'] = 'grmpy-result', RESULT_VERSION, \
+        __version__
+    header['result'] = encode_content(rslt, arrays, [])
+
+    with zipfile.ZipFile(fname + '.tmp', 'w', zipfile.ZIP_STORED, allowZip64=True) as archive:
+        archive.writestr('header.json', json.dumps(header))
+        for key_, array in arrays.items():
+            buffer = io.BytesIO()
+            npy_format.write_array(buffer, array, allow_pickle=False)
+            archive.writestr(key_ + '.npy', buffer.getvalue())
+    os.replace(fname + '.tmp', fname)
+
+
+def encode_content(content, arrays, path):
+    """The function returns the content in a form that can be written to JSON, where the arrays
+    are replaced by references to their entries in the archive.
+    """
+    if isinstance(content, np.ndarray):
+        key_ = '/'.join(path)
+        arrays[key_] = np.ascontiguousarray(content)
+        return {'__array__': key_}
+    elif isinstance(content, dict):
+        return {str(key_): encode_content(value, arrays, path + [str(key_)])
+                for key_, value in content.items()}
+    elif isinstance(content, (list, tuple)):
+        return [encode_content(value, arrays, path + [str(i)]) for i, value in enumerate(content)]
+    elif isinstance(content, np.generic):
+        return content.item()
+    else:
+        return content
+
+
+def load_result(fname, mmap=True):
+    """The function loads an estimation result from the archive fname. If mmap is true, large
+    arrays are memory-mapped in read-only mode, so that they are only read once they are accessed.
+    """
+    if not os.path.isfile(fname):
+        msg = 'The result file {} does not exist.'.format(fname)
+        raise UserError(msg)
+
+    with zipfile.ZipFile(fname, 'r') as archive:
+        try:
+            header = json.loads(archive.read('header.json').decode('utf-8'))
+        except KeyError:
+            header = dict()
+
+        if header.get('format') != 'grmpy-result' or header.get('version', 0) > RESULT_VERSION:
+            msg = 'The file {} is not an estimation result that is supported by this version of ' \
+                  'grmpy.'.format(fname)
+            raise UserError(msg)
+
+        def decode(content):
+            if isinstance(content, dict) and list(content.keys()) == ['__array__']:
+                return read_array(fname, archive, content['__array__'] + '.npy', mmap)
+            elif isinstance(content, dict):
+                return {key_: decode(value) for key_, value in content.items()}
+            elif isinstance(content, list):
+                return [decode(value) for value in content]
+            else:
+                return content
+
+        return decode(header['result'])
+
+
+def read_array(fname, archive, name, mmap):
+    """The function reads an array from the archive. Large arrays are memory-mapped at their
+    position in the uncompressed archive.
+    """
+    info = archive.getinfo(name)
+    if not mmap or info.compress_type != zipfile.ZIP_STORED or info.file_size < MMAP_SIZE:
+        with archive.open(name) as file_:
+            return npy_format.read_array(file_, allow_pickle=False)
+
+    with open(fname, 'rb') as file_:
+        # The data of a member follows its local header, whose variable fields may differ from
+        # the central directory.
+        file_.seek(info.header_offset + 26)
+        name_size, extra_size = np.frombuffer(file_.read(4), dtype='<u2')
+        file_.seek(info.header_offset + 30 + int(name_size) + int(extra_size))
+
+        version = npy_format.read_magic(file_)
+        if version == (1, 0):
+            shape, fortran_order, dtype = npy_format.read_array_header_1_0(file_)
+        else:
+            shape, fortran_order, dtype = npy_format.read_array_header_2_0(file_)
+        offset = file_.tell()
+
+    if dtype.hasobject:
+        msg = 'The result file {} contains arrays of objects.'.format(fname)
+        raise UserError(msg)
+
+    return np.memmap(fname, dtype=dtype, mode='r', shape=shape, offset=offset,
+                     order='F' if fortran_order else 'C')
@@ -0,0 +1,192 @@
+"""The module provides the automatic start values of the estimation process. The coefficients of
+the potential outcomes are estimated by ordinary least squares for each treatment state and the
+choice coefficients by a probit model. Both estimators work on the prepared data of the likelihood
+function and only accumulate sufficient statistics within each shard, so that they support the
+streaming of the data in blocks as well. Alternatively, the estimation starts from the result of a
+previous estimation.
+"""
+import pickle
+import os
+import re
+
+from scipy.special import log_ndtr
+import numpy as np
+
+from grmpy.estimate.estimate_likelihood import reduce_shards
+from grmpy.estimate.estimate_result import load_result
+from grmpy.estimate.estimate_likelihood import LOG_SQRT_2PI
+from grmpy.estimate.estimate_likelihood import map_shards
+from grmpy.check.custom_exceptions import UserError
+
+
+def auto_start_values(init_dict, prep, maxiter=35, tol=1e-8):
+    """The function returns the start values of the coefficients of both potential outcomes, the
+    choice coefficients and the standard deviations of the outcome equations, followed by the
+    placeholders for their correlations with the unobservable of the choice equation.
+    """
+    beta, sd_ = ols_states(init_dict, prep)
+    gamma = probit(init_dict, prep, maxiter, tol)
+
+    return np.concatenate((beta['TREATED'], beta['UNTREATED'], gamma,
+                           [sd_['TREATED'], 0.0, sd_['UNTREATED'], 0.0]))
+
+
+def ols_states(init_dict, prep):
+    """The function regresses the dependent variable on the covariates of the outcome equation
+    separately for each treatment state. The normal equations are solved by a Cholesky
+    factorization, rank deficient designs fall back to the minimum norm solution.
+    """
+    rslt = reduce_shards(map_shards(shard_ols, None, init_dict, prep))
+
+    beta, sd_ = dict(), dict()
+    for j, key_ in enumerate(['TREATED', 'UNTREATED']):
+        xtx, xty, yty, num_obs = rslt[4 * j:4 * j + 4]
+        try:
+            factor = np.linalg.cholesky(xtx)
+            beta[key_] = np.linalg.solve(factor.T, np.linalg.solve(factor, xty))
+            rank = xtx.shape[0]
+        except np.linalg.LinAlgError:
+            beta[key_], _, rank, _ = np.linalg.lstsq(xtx, xty, rcond=-1)
+
+        if num_obs <= rank:
+            msg = 'There are not enough agents in the {} state to determine the start ' \
+                  'values.'.format(key_)
+            raise UserError(msg)
+
+        ssr = max(yty - beta[key_].dot(xty), 0.0)
+        sd_[key_] = np.sqrt(ssr / (num_obs - rank))
+
+    return beta, sd_
+
+
+def shard_ols(_, init_dict, key_, data):
+    """The function returns the cross products of the outcome covariates and the dependent
+    variable within a shard, for both treatment states in turn. The entries of the other state
+    are zero.
+    """
+    rslt = []
+    for state in ['TREATED', 'UNTREATED']:
+        num_covars = len(init_dict['AUX']['labels'][state])
+        if state == key_:
+            X, Y = data['X'], data['Y']
+            rslt += [X.T.dot(X), X.T.dot(Y), Y.dot(Y), Y.shape[0]]
+        else:
+            rslt += [np.zeros((num_covars, num_covars)), np.zeros(num_covars), 0.0, 0]
+
+    return rslt
+
+
+def probit(init_dict, prep, maxiter, tol):
+    """The function maximizes the log-likelihood of the probit model for the treatment decision
+    by Newton's method, starting from a zero vector.
+    """
+    gamma = np.zeros(len(init_dict['AUX']['labels']['CHOICE']))
+    for _ in range(maxiter):
+        grad, hess, num_misfit = reduce_shards(map_shards(shard_probit, gamma, init_dict, prep))
+
+        # Newton's method diverges if the covariates perfectly predict the treatment decision.
+        if num_misfit == 0:
+            msg = 'The treatment decision is perfectly predicted by the choice covariates.'
+            raise UserError(msg)
+
+        step = np.linalg.solve(hess, grad)
+        gamma = gamma + step
+        if np.max(np.abs(step)) < tol:
+            break
+
+    return gamma
+
+
+def shard_probit(gamma, init_dict, key_, data):
+    """The function returns the gradient and the negative hessian of the probit log-likelihood
+    within a shard as well as the number of agents whose decision is not predicted with
+    certainty.
+    """
+    sign = 1.0 if key_ == 'TREATED' else -1.0
+
+    index = data['Z'].dot(gamma)
+    log_cdf = log_ndtr(sign * index)
+    mills = sign * np.exp(-LOG_SQRT_2PI - 0.5 * index ** 2 - log_cdf)
+
+    grad = data['Z'].T.dot(mills)
+    hess = (data['Z'] * (mills * (mills + index))[:, None]).T.dot(data['Z'])
+    num_misfit = np.count_nonzero(-np.expm1(log_cdf) > 1e-8)
+
+    return grad, hess, num_misfit
+
+
+def result_start_values(init_dict):
+    """The function returns the start values from the result of a previous estimation. The
+    coefficients are mapped onto the current specification by the labels of the covariates, where
+    covariates that are not part of the previous result start at zero.
+    """
+    coeffs = read_result_file(init_dict['ESTIMATION'].get('start_file'))
+
+    x0 = []
+    for key_ in ['TREATED', 'UNTREATED', 'CHOICE']:
+        x0 += [coeffs[key_].get(str(label), 0.0) for label in init_dict['AUX']['labels'][key_]]
+
+    x0 += [coeffs['DIST'][label] for label in ['sigma1', 'rho1', 'sigma0', 'rho0']]
+
+    return np.array(x0)
+
+
+def read_result_file(fname):
+    """The function returns the estimated coefficients of each section by the labels of the
+    covariates, either from a saved or pickled result dictionary of the estimation or from an info
+    file.
+    """
+    if fname is None or not os.path.isfile(fname):
+        msg = 'The result file specified in the Estimation section does not exist.'
+        raise UserError(msg)
+
+    if fname.endswith('.info'):
+        with open(fname, 'r') as file_:
+            coeffs = parse_info_file(file_.readlines())
+    else:
+        if fname.endswith('.npz'):
+            rslt = load_result(fname, mmap=False)
+        else:
+            with open(fname, 'rb') as file_:
+                rslt = pickle.load(file_)
+
+        coeffs = dict()
+        for key_ in ['TREATED', 'UNTREATED', 'CHOICE']:
+            labels = [str(rslt['varnames'][j - 1]) for j in rslt[key_]['order']]
+            coeffs[key_] = dict(zip(labels, map(float, rslt[key_]['all'])))
+        coeffs['DIST'] = dict(zip(['sigma1', 'rho1', 'sigma0', 'rho0'],
+                                  map(float, rslt['AUX']['x_internal'][-4:])))
+
+    if sorted(coeffs.keys()) != ['CHOICE', 'DIST', 'TREATED', 'UNTREATED'] or \
+            len(coeffs['DIST']) != 4:
+        msg = 'The result file {} does not contain the coefficients of all sections.'.format(fname)
+        raise UserError(msg)
+
+    return coeffs
+
+
+def parse_info_file(lines):
+    """The function returns the coefficients of each section from the economic parameters of an
+    info file, where the final coefficient follows the identifier and the start coefficient. The
+    economic parameters are the last part of the file. The coefficients are written with four
+    decimals, which separates them even if wide columns run into each other.
+    """
+    coeffs, section = dict(), None
+    for line in lines:
+        list_ = line.split()
+        if len(list_) == 1 and list_[0] in ['TREATED', 'UNTREATED', 'CHOICE', 'DIST']:
+            section = list_[0]
+            coeffs[section] = dict()
+        elif section is not None and len(list_) >= 3:
+            values = re.findall(r'-?\d+\.\d{4}', ''.join(list_[1:]))
+            coeffs[section][list_[0]] = float(values[1])
+
+    # The coefficients are rounded to four decimals, so the standard deviations may not be positive
+    # and the correlations may not be strictly between -1 and 1.
+    dist = coeffs.get('DIST', dict())
+    for label in set(dist.keys()) & {'sigma1', 'sigma0'}:
+        dist[label] = max(dist[label], 1e-4)
+    for label in set(dist.keys()) & {'rho1', 'rho0'}:
+        dist[label] = float(np.clip(dist[label], -0.9999, 0.9999))
+
+    return coeffs
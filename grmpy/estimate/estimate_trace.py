@@ -0,0 +1,76 @@
+"""The module provides the trace of the optimization process. The evaluated parameterizations and
+the associated criterion function values are stored in preallocated arrays that grow as required,
+and the best evaluation is tracked separately so that it is available at any time. The number of
+stored evaluations can be bounded and all evaluations can be written to a JSON lines file for the
+analysis of the convergence behavior.
+"""
+import json
+
+import numpy as np
+
+
+def create_trace(num_paras, capacity=0, ring=True, fname=None, append=False):
+    """The function returns an empty trace for parameter vectors of length num_paras. A capacity of
+    zero stores all evaluations. Otherwise at most capacity evaluations are stored, either the most
+    recent ones (ring) or the first ones. If a file name is specified, each evaluation is appended
+    to the file as well. The file is replaced unless append is true.
+    """
+    size = capacity if capacity > 0 else 64
+
+    trace = dict()
+    trace['parameter'] = np.empty((size, num_paras))
+    trace['crit'] = np.empty(size)
+    trace['capacity'], trace['ring'] = capacity, ring
+    trace['num_evals'], trace['num_stored'], trace['position'] = 0, 0, 0
+    trace['best'] = {'eval': None, 'crit': np.inf, 'parameter': None}
+    trace['file'] = open(fname, 'a' if append else 'w') if fname is not None else None
+
+    return trace
+
+
+def record_evaluation(trace, x, crit):
+    """The function adds an evaluation of the criterion function to the trace. Evaluations that
+    are not finite never become the best evaluation.
+    """
+    if np.isfinite(crit) and crit < trace['best']['crit']:
+        trace['best'] = {'eval': trace['num_evals'], 'crit': crit, 'parameter': np.array(x)}
+
+    if trace['file'] is not None:
+        line = {'eval': trace['num_evals'], 'crit': float(crit), 'parameter': list(map(float, x))}
+        trace['file'].write(json.dumps(line) + '\n')
+
+    trace['num_evals'] += 1
+
+    # Without a capacity the arrays double their size whenever they are full.
+    size = trace['crit'].shape[0]
+    if trace['capacity'] == 0 and trace['num_stored'] == size:
+        trace['parameter'] = np.concatenate((trace['parameter'], np.empty_like(trace['parameter'])))
+        trace['crit'] = np.concatenate((trace['crit'], np.empty_like(trace['crit'])))
+        trace['position'] = trace['num_stored']
+    elif trace['num_stored'] == size and not trace['ring']:
+        return
+
+    trace['parameter'][trace['position']] = x
+    trace['crit'][trace['position']] = crit
+    trace['num_stored'] = min(trace['num_stored'] + 1, trace['crit'].shape[0])
+    trace['position'] = (trace['position'] + 1) % trace['crit'].shape[0]
+
+
+def trace_values(trace):
+    """The function returns the stored parameterizations and criterion function values in the
+    order of their evaluation.
+    """
+    num_stored, size = trace['num_stored'], trace['crit'].shape[0]
+    if num_stored < size:
+        index = np.arange(num_stored)
+    else:
+        index = (trace['position'] + np.arange(size)) % size
+
+    return trace['parameter'][index], trace['crit'][index]
+
+
+def close_trace(trace):
+    """The function completes the file of the trace."""
+    if trace['file'] is not None:
+        trace['file'].close()
+        trace['file'] = None
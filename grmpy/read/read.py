@@ -1,19 +1,47 @@
 """The module contains the main function of the init file import process."""
+from collections import OrderedDict
+import hashlib
 import shlex
+import os
+
+import numpy as np
 
 from grmpy.check.check import check_presence_init
+from grmpy.read.read_auxiliary import spec_lines
 from grmpy.read.read_auxiliary import auxiliary
 from grmpy.read.read_auxiliary import process
 
+SPECS = OrderedDict()
+SPECS_SIZE = 32
+
 
 def read(file_):
     """The function reads the initialization file and returns a dictionary with parameters for the
-    simulation.
+    simulation. The processed specification is cached for each file and reused as long as neither
+    the modification time nor the content of the file change. Each call returns its own copy.
     """
     check_presence_init(file_)
 
+    fname = os.path.abspath(file_)
+    with open(fname, 'rb') as file_:
+        content = file_.read()
+    identity = (os.stat(fname).st_mtime, hashlib.sha1(content).hexdigest())
+
+    if fname in SPECS.keys() and SPECS[fname][0] == identity:
+        SPECS.move_to_end(fname)
+    else:
+        SPECS[fname] = (identity, parse_init(content.decode()))
+        SPECS.move_to_end(fname)
+        while len(SPECS) > SPECS_SIZE:
+            SPECS.popitem(last=False)
+
+    return copy_init_dict(SPECS[fname][1])
+
+
+def parse_init(content):
+    """The function processes the content of an initialization file."""
     dict_ = {'varnames': []}
-    for line in open(file_).readlines():
+    for line in content.splitlines():
 
         list_ = shlex.split(line)
 
@@ -34,3 +62,43 @@ def read(file_):
     dict_ = auxiliary(dict_)
 
     return dict_
+
+
+def invalidate(file_=None):
+    """The function removes the processed specification of the initialization file from the cache
+    of the read function, or all specifications if no file is specified.
+    """
+    if file_ is None:
+        SPECS.clear()
+    else:
+        SPECS.pop(os.path.abspath(file_), None)
+
+
+def copy_init_dict(dict_):
+    """The function returns a copy of the initialization dictionary. The nested dictionaries, lists
+    and arrays are copied, all other values are immutable and therefore shared.
+    """
+    if isinstance(dict_, dict):
+        return {key_: copy_init_dict(value) for key_, value in dict_.items()}
+    elif isinstance(dict_, list):
+        return [copy_init_dict(value) for value in dict_]
+    elif isinstance(dict_, np.ndarray):
+        return dict_.copy()
+    else:
+        return dict_
+
+
+def process_init_dict(spec):
+    """The function processes a model specification that is already available as a dictionary, for
+    instance the result of read that was modified afterwards. The specification is processed in the
+    same way as the corresponding initialization file, without any access to the file system.
+    """
+    dict_ = {'varnames': list(spec.get('varnames', []))}
+    for keyword, list_ in spec_lines(spec):
+        if keyword not in dict_.keys():
+            dict_[keyword] = {}
+        process(list_, dict_, keyword)
+
+    dict_ = auxiliary(dict_)
+
+    return dict_
@@ -23,25 +23,33 @@ def process(list_, dict_, keyword):
     if keyword in ['TREATED', 'UNTREATED', 'CHOICE'] and 'order' not in dict_[keyword].keys():
         dict_[keyword]['order'] = []
     if keyword in ['TREATED', 'UNTREATED', 'CHOICE']:
-        if order not in dict_['varnames']:
+        # The positions of the variable names are tracked in a dictionary during the import, so
+        # that the lookup does not depend on the number of covariates.
+        if 'positions' not in dict_.keys():
+            dict_['positions'] = {label: j for j, label in enumerate(dict_['varnames'])}
+        if order not in dict_['positions'].keys():
+            dict_['positions'][order] = len(dict_['varnames'])
             dict_['varnames'] += [order]
         if len(list_) >= 5:
             if type_ == 'binary':
                 dict_[keyword]['types'] += [[type_, float(frac_)]]
-                dict_[keyword]['order'] += [dict_['varnames'].index(order) + 1]
+                dict_[keyword]['order'] += [dict_['positions'][order] + 1]
             elif type_ == 'categorical':
                 categories = convert_categories_probs(categories, 'categories')
                 prob = convert_categories_probs(prob)
-                dict_[keyword]['order'] += [dict_['varnames'].index(order) + 1]
+                dict_[keyword]['order'] += [dict_['positions'][order] + 1]
                 dict_[keyword]['types'] += [['categorical', categories, prob]]
         else:
-            dict_[keyword]['order'] += [dict_['varnames'].index(order) + 1]
+            dict_[keyword]['order'] += [dict_['positions'][order] + 1]
             dict_[keyword]['types'] += ['nonbinary']
 
     # Type conversion
-    if name in ['agents', 'seed', 'maxiter', 'disp', 'comparison']:
+    if name in ['agents', 'seed', 'maxiter', 'disp', 'comparison', 'workers', 'chunksize',
+                'stream', 'trace', 'batch', 'refine', 'starts', 'rounds', 'processes']:
         val = int(val)
-    elif name in ['source', 'file', 'optimizer', 'start', 'dependent', 'indicator', 'output_file']:
+    elif name in ['source', 'file', 'optimizer', 'start', 'dependent', 'indicator', 'output_file',
+                  'se_method', 'formats', 'rng', 'trace_file', 'stages', 'checkpoint',
+                  'start_file', 'cache']:
         val = str(val)
     elif name in ['direc']:
         val = list(val)
@@ -55,6 +63,48 @@ def process(list_, dict_, keyword):
     return dict_
 
 
+def spec_lines(spec):
+    """The function converts a model specification dictionary in the lines of the corresponding
+    initialization file and returns them together with the section they belong to.
+    """
+    lines = []
+    sections = ['SIMULATION', 'ESTIMATION', 'TREATED', 'UNTREATED', 'CHOICE', 'DIST']
+    excluded = sections + ['AUX', 'DETERMINISTIC']
+    sections += [key_ for key_ in spec.keys() if key_ not in excluded and key_.isupper()]
+
+    for keyword in sections:
+        if keyword not in spec.keys():
+            continue
+        if keyword in ['TREATED', 'UNTREATED', 'CHOICE']:
+            for i, coeff in enumerate(spec[keyword]['all']):
+                # Processed specifications refer to the covariates by their position in varnames
+                order = spec[keyword]['order'][i]
+                if isinstance(order, (int, np.integer)) and 'varnames' in spec.keys():
+                    order = spec['varnames'][order - 1]
+                list_ = ['coeff', str(order), coeff]
+
+                type_ = spec[keyword]['types'][i] if 'types' in spec[keyword].keys() else None
+                if isinstance(type_, list) and type_[0] == 'binary':
+                    list_ += ['binary', type_[1]]
+                elif isinstance(type_, list) and type_[0] == 'categorical':
+                    list_ += ['categorical'] + \
+                             ['(' + ','.join(str(k) for k in type_[j]) + ')' for j in [1, 2]]
+                lines += [(keyword, list_)]
+
+        elif keyword == 'DIST':
+            lines += [(keyword, ['coeff', coeff]) for coeff in spec[keyword]['all']]
+
+        else:
+            for name, val in spec[keyword].items():
+                if name == 'formats' and isinstance(val, list):
+                    val = ','.join(val) or 'none'
+                elif name == 'stages' and isinstance(val, list):
+                    val = ','.join(str(i) for i in val)
+                lines += [(keyword, [name, val])]
+
+    return lines
+
+
 def auxiliary(dict_):
     """The function creates an new dictionary entry 'AUX' that includes starting values of each
     parameter and the number of covariates.
@@ -79,6 +129,69 @@ def auxiliary(dict_):
         dict_['ESTIMATION']['indicator'] = 'D'
     if 'dependent' not in dict_['ESTIMATION'].keys():
         dict_['ESTIMATION']['dependent'] = 'Y'
+    if 'se_method' not in dict_['ESTIMATION'].keys():
+        dict_['ESTIMATION']['se_method'] = 'hessian'
+    if 'workers' not in dict_['ESTIMATION'].keys():
+        dict_['ESTIMATION']['workers'] = 1
+    if 'chunksize' not in dict_['ESTIMATION'].keys():
+        dict_['ESTIMATION']['chunksize'] = 100000
+    if 'stream' not in dict_['ESTIMATION'].keys():
+        dict_['ESTIMATION']['stream'] = 0
+    if 'trace' not in dict_['ESTIMATION'].keys():
+        dict_['ESTIMATION']['trace'] = 0
+
+    # The comparison output requires the whole sample in memory, so it is not written by default
+    # if the data is streamed.
+    if 'comparison' not in dict_['ESTIMATION'].keys():
+        dict_['ESTIMATION']['comparison'] = 0 if dict_['ESTIMATION']['stream'] == 1 else 1
+
+    # A single start is optimized by default, otherwise the starts are screened in rounds of
+    # iterations by a pool of processes, one for each start or CPU by default. The checkpoints are
+    # written every minute and there is no time budget by default. The results are only cached if
+    # a cache directory is specified, which holds up to a GB of results by default.
+    for key_, value in [('starts', 1), ('rounds', 5), ('margin', 0.01), ('spread', 0.1),
+                        ('processes', 0), ('interval', 60.0), ('budget', 0.0),
+                        ('cache_size', 1024.0)]:
+        if key_ not in dict_['ESTIMATION'].keys():
+            dict_['ESTIMATION'][key_] = value
+
+    # The stages of the estimation are specified as a comma separated list of the shares of the
+    # agents in each subsample, the last stage always includes all agents.
+    if 'stages' not in dict_['ESTIMATION'].keys():
+        dict_['ESTIMATION']['stages'] = [1.0]
+    elif not isinstance(dict_['ESTIMATION']['stages'], list):
+        stages = dict_['ESTIMATION']['stages'].split(',')
+        dict_['ESTIMATION']['stages'] = [float(i) for i in stages if i.strip() != '']
+    if dict_['ESTIMATION']['stages'][-1:] != [1.0]:
+        dict_['ESTIMATION']['stages'] += [1.0]
+
+    # Default options of the optimizers that are provided by grmpy and of the optimizers that
+    # use second derivatives
+    defaults = dict()
+    defaults['GRMPY-ADAM'] = [('batch', 1000), ('rate', 0.01), ('decay', 0.0), ('refine', 20)]
+    for optimizer in ['GRMPY-NEWTON', 'GRMPY-BHHH', 'SCIPY-TRUST-NCG', 'SCIPY-TRUST-EXACT']:
+        defaults[optimizer] = [('gtol', 1e-06)]
+
+    optimizer = dict_['ESTIMATION'].get('optimizer')
+    if optimizer in defaults.keys():
+        if optimizer not in dict_.keys():
+            dict_[optimizer] = {}
+        for key_, value in defaults[optimizer]:
+            if key_ not in dict_[optimizer].keys():
+                dict_[optimizer][key_] = value
+
+    if 'chunksize' not in dict_['SIMULATION'].keys():
+        dict_['SIMULATION']['chunksize'] = 0
+    if 'rng' not in dict_['SIMULATION'].keys():
+        dict_['SIMULATION']['rng'] = 'legacy'
+
+    # The output formats of the simulation are specified as a comma separated list, none
+    # suppresses the data output altogether.
+    if 'formats' not in dict_['SIMULATION'].keys():
+        dict_['SIMULATION']['formats'] = ['pkl', 'txt']
+    elif not isinstance(dict_['SIMULATION']['formats'], list):
+        formats = [i.strip() for i in dict_['SIMULATION']['formats'].lower().split(',')]
+        dict_['SIMULATION']['formats'] = [i for i in formats if i not in ['', 'none']]
 
     # Number of covariates
     num_covars_treated = len(dict_['TREATED']['all'])
@@ -104,112 +217,66 @@ def auxiliary(dict_):
             else:
                 del dict_[key_][j]
     dict_['DETERMINISTIC'] = is_deterministic
+    dict_.pop('positions', None)
     dict_ = check_types(dict_)
+    dict_ = create_index(dict_)
+
+    return dict_
+
+
+def create_index(dict_):
+    """The function stores the column positions and labels of the covariates of each section as
+    well as the position of each section in the parameter vector, so that they do not have to be
+    looked up repeatedly. OUTCOMES refers to the covariates of either of the potential outcomes.
+    """
+    dict_['AUX']['columns'], dict_['AUX']['labels'], dict_['AUX']['slices'] = {}, {}, {}
+
+    union = sorted(set(dict_['TREATED']['order'] + dict_['UNTREATED']['order']))
+    orders = [(key_, dict_[key_]['order']) for key_ in ['TREATED', 'UNTREATED', 'CHOICE']]
+    for key_, order in orders + [('OUTCOMES', union)]:
+        dict_['AUX']['columns'][key_] = np.array(order, dtype=int) - 1
+        dict_['AUX']['labels'][key_] = [dict_['varnames'][j - 1] for j in order]
+
+    start = 0
+    for key_ in ['TREATED', 'UNTREATED', 'CHOICE', 'DIST']:
+        stop = start + len(dict_[key_]['all'])
+        dict_['AUX']['slices'][key_] = slice(start, stop)
+        start = stop
 
     return dict_
 
 
 def check_types(dict_):
     """This function ensures that the variable types agree across the two treatment states and the
-    costs.
+    costs. A binary or categorical specification of a covariate in one section is carried over to
+    the other sections that include the covariate.
     """
+    sections = ['TREATED', 'UNTREATED', 'CHOICE']
+    positions = {key_: {j: index for index, j in enumerate(dict_[key_]['order'])}
+                 for key_ in sections}
+
     list_ = []
-    covars = set(dict_['TREATED']['order'] + dict_['UNTREATED']['order'] + dict_['CHOICE']['order'])
-    for i in covars:
-        if i in dict_['TREATED']['order'] and i in dict_['UNTREATED']['order'] \
-                and i in dict_['CHOICE']['order']:
-            if i == 1:
-                keys = ['TREATED', 'UNTREATED', 'CHOICE']
-                for key_ in keys:
-                    index = dict_[key_]['order'].index(i)
-                    dict_[key_]['types'][index] = 'nonbinary'
-            else:
-                keys = ['TREATED', 'UNTREATED', 'CHOICE']
-                for key_ in keys:
-                    index = dict_[key_]['order'].index(i)
-                    if isinstance(dict_[key_]['types'][index], list):
-                        other_keys = [j for j in keys if j != key_]
-                        for other in other_keys:
-                            index_other = dict_[other]['order'].index(i)
-                            if not isinstance(dict_[other]['types'][index_other], list):
-                                dict_[other]['types'][index_other] = dict_[key_]['types'][index]
-                            elif dict_[other]['types'][index_other] == dict_[key_]['types'][index]:
-                                pass
-                            else:
-                                msg = 'Your initilaization file has two different binary ' \
-                                      'specification for the same covariate.'
-                                raise UserError(msg)
-            list_ += [dict_['CHOICE']['types'][index]]
-
-        elif i in dict_['TREATED']['order'] and i in dict_['UNTREATED']['order'] \
-                and i not in dict_['CHOICE']['order']:
-            keys = ['TREATED', 'UNTREATED']
-            for key_ in keys:
-                index = dict_[key_]['order'].index(i)
-                if isinstance(dict_[key_]['types'][index], list):
-                    other_keys = [j for j in keys if j != key_]
-
-                    for other in other_keys:
-                        index_other = dict_[other]['order'].index(i)
-                        if not isinstance(dict_[other]['types'][index_other], list):
-                            dict_[other]['types'][index_other] = dict_[key_]['types'][index]
-
-                        elif dict_[other]['types'][index_other] == dict_[key_]['types'][index]:
-                            pass
-                        else:
-                            msg = 'Your initilaization file has two different binary ' \
-                                  'specification for the same covariate.'
-                            raise UserError(msg)
-            list_ += [dict_['UNTREATED']['types'][index]]
-
-        elif i not in dict_['TREATED']['order'] and i in dict_['UNTREATED']['order'] \
-                and i in dict_['CHOICE']['order']:
-            keys = ['UNTREATED', 'CHOICE']
-            for key_ in keys:
-                index = dict_[key_]['order'].index(i)
-                if isinstance(dict_[key_]['types'][index], list):
-                    other_keys = [j for j in keys if j != key_]
-                    for other in other_keys:
-                        index_other = dict_[other]['order'].index(i)
-                        if not isinstance(dict_[other]['types'][index_other], list):
-                            dict_[other]['types'][index_other] = dict_[key_]['types'][index]
-                        elif dict_[other]['types'][index_other] == dict_[key_]['types'][index]:
-                            pass
-                        else:
-                            msg = 'Your initilaization file has two different binary ' \
-                                  'specification for the same covariate.'
-                            raise UserError(msg)
-            list_ += [dict_['CHOICE']['types'][index]]
-
-        elif i in dict_['TREATED']['order'] and i not in dict_['UNTREATED']['order'] \
-                and i in dict_['CHOICE']['order']:
-            keys = ['TREATED', 'CHOICE']
+    for i in sorted(set().union(*[dict_[key_]['order'] for key_ in sections])):
+        keys = [key_ for key_ in sections if i in positions[key_].keys()]
+        types = [dict_[key_]['types'][positions[key_][i]] for key_ in keys]
+
+        # The first covariate is the intercept if all sections include it.
+        if i == 1 and len(keys) == 3:
             for key_ in keys:
-                index = dict_[key_]['order'].index(i)
-                if isinstance(dict_[key_]['types'][index], list):
-                    other_keys = [j for j in keys if j != key_]
-                    for other in other_keys:
-                        index_other = dict_[other]['order'].index(i)
-                        if not isinstance(dict_[other]['types'][index_other], list):
-                            dict_[other]['types'][index_other] = dict_[key_]['types'][index]
-                        elif dict_[other]['types'][index_other] == dict_[key_]['types'][index]:
-                            pass
-                        else:
-                            msg = 'Your initilaization file has two different binary ' \
-                                  'specification for the same covariate.'
-                            raise UserError(msg)
-            list_ += [dict_['CHOICE']['types'][index]]
+                dict_[key_]['types'][positions[key_][i]] = 'nonbinary'
+
+        elif len(keys) > 1:
+            specified = [type_ for type_ in types if isinstance(type_, list)]
+            if any(type_ != specified[0] for type_ in specified):
+                msg = 'Your initilaization file has two different binary ' \
+                      'specification for the same covariate.'
+                raise UserError(msg)
+            elif specified:
+                for key_ in keys:
+                    dict_[key_]['types'][positions[key_][i]] = specified[0]
+
+        list_ += [dict_[keys[-1]]['types'][positions[keys[-1]][i]]]
 
-        else:
-            if i in dict_['TREATED']['order']:
-                index = dict_['TREATED']['order'].index(i)
-                list_ += [dict_['TREATED']['types'][index]]
-            elif i in dict_['UNTREATED']['order']:
-                index = dict_['UNTREATED']['order'].index(i)
-                list_ += [dict_['UNTREATED']['types'][index]]
-            else:
-                index = dict_['CHOICE']['order'].index(i)
-                list_ += [dict_['CHOICE']['types'][index]]
     dict_['AUX']['types'] = list_
 
     return dict_
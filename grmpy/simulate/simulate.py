@@ -1,41 +1,39 @@
 """The module provides the simulation process."""
-import numpy as np
-
 from grmpy.simulate.simulate_auxiliary import simulate_unobservables
+from grmpy.simulate.simulate_auxiliary import construct_data_frame
 from grmpy.simulate.simulate_auxiliary import simulate_covariates
 from grmpy.estimate.estimate_auxiliary import calculate_criteria
 from grmpy.simulate.simulate_auxiliary import simulate_outcomes
-from grmpy.simulate.simulate_auxiliary import write_output
+from grmpy.simulate.simulate_auxiliary import random_streams
 from grmpy.estimate.estimate_auxiliary import start_values
+from grmpy.simulate.simulate_auxiliary import data_summary
+from grmpy.simulate.simulate_stream import simulate_stream
 from grmpy.simulate.simulate_auxiliary import print_info
+from grmpy.simulate.simulate_auxiliary import write_data
 from grmpy.check.check import check_initialization_dict
+from grmpy.read.read import process_init_dict
 from grmpy.read.read import read
 
 
 def simulate(init_file):
-    """This function simulates a user-specified version of the generalized Roy model."""
+    """This function simulates a user-specified version of the generalized Roy model. If a chunksize
+    is specified in the SIMULATION section, the agents are simulated and written in chunks and the
+    function returns the descriptive statistics of the sample instead of the data frame.
+    """
     init_dict = read(init_file)
 
     # We perform some basic consistency checks regarding the user's request.
     check_initialization_dict(init_dict)
 
-    # Distribute information
-    seed = init_dict['SIMULATION']['seed']
-
-    # Set random seed to ensure recomputabiltiy
-    np.random.seed(seed)
+    # Large samples are simulated in chunks that are written to the output files right away.
+    if 0 < init_dict['SIMULATION']['chunksize'] < init_dict['SIMULATION']['agents']:
+        summary = simulate_stream(init_dict)
+        print_info(init_dict, summary)
+        return summary
 
-    # Simulate unobservables of the model
-    U, V = simulate_unobservables(init_dict)
-
-    # Simulate observables of the model
-    X = simulate_covariates(init_dict)
-
-    # Simulate endogeneous variables of the model
-    Y, D, Y_1, Y_0 = simulate_outcomes(init_dict, X, U, V)
-
-    # Write output file
-    df = write_output(init_dict, Y, D, X, Y_1, Y_0, U, V)
+    # Simulate the sample and write the output files
+    df = simulate_data(init_dict)
+    write_data(df, init_dict['SIMULATION']['source'], init_dict['SIMULATION']['formats'])
 
     # Calculate Criteria function value
     if not init_dict['DETERMINISTIC']:
@@ -43,6 +41,36 @@ def simulate(init_file):
         init_dict['AUX']['criteria_value'] = calculate_criteria(init_dict, df, x0)
 
     # Print Log file
-    print_info(init_dict, df)
+    print_info(init_dict, data_summary(init_dict, df))
 
     return df
+
+
+def simulate_in_memory(spec):
+    """This function simulates the generalized Roy model for a specification that is available as
+    a dictionary, for instance the result of read, and returns the simulated data frame. In
+    contrast to simulate, there are no output files.
+    """
+    init_dict = process_init_dict(spec)
+
+    # We perform some basic consistency checks regarding the user's request.
+    check_initialization_dict(init_dict)
+
+    return simulate_data(init_dict)
+
+
+def simulate_data(init_dict):
+    """This function simulates the sample for the processed initialization dictionary."""
+    # The random number generators are seeded to ensure recomputabiltiy
+    streams = random_streams(init_dict)
+
+    # Simulate unobservables of the model
+    U, V = simulate_unobservables(init_dict, streams)
+
+    # Simulate observables of the model
+    X = simulate_covariates(init_dict, streams)
+
+    # Simulate endogeneous variables of the model
+    Y, D, Y_1, Y_0 = simulate_outcomes(init_dict, X, U, V)
+
+    return construct_data_frame(init_dict, Y, D, X, Y_1, Y_0, U, V)
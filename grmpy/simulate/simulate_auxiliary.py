@@ -2,65 +2,150 @@
 processes of the unobservable and endogenous variables of the model as well as functions regarding
 the info file output.
 """
+from collections import OrderedDict
+
 from scipy.stats import norm
 import pandas as pd
 import numpy as np
 
+from grmpy.check.custom_exceptions import UserError
+
+FACTORS = dict()
+
+
+def random_streams(init_dict, seed=None):
+    """The function returns the random number generators for the unobservables, the normal
+    covariates and each of the binary and categorical covariates. With the legacy generator all
+    components are drawn one after another from a single RandomState, which reproduces the samples
+    of the earlier releases. Otherwise, each component has its own independent Generator that is
+    spawned from the seed.
+    """
+    if seed is None:
+        seed = init_dict['SIMULATION']['seed']
+    rng = init_dict['SIMULATION']['rng']
+    types = init_dict['AUX']['types']
+
+    keys = ['U', 'X'] + [i for i, type_ in enumerate(types) if is_drawn_separately(i, type_)]
+    if rng == 'legacy':
+        random_state = np.random.RandomState(seed)
+        streams = {key_: random_state for key_ in keys}
+    else:
+        bit_generator = {'pcg64': np.random.PCG64, 'philox': np.random.Philox}[rng]
+        children = np.random.SeedSequence(seed).spawn(len(keys))
+        streams = {key_: np.random.Generator(bit_generator(child))
+                   for key_, child in zip(keys, children)}
 
-def simulate_covariates(init_dict):
+    return streams
+
+
+def simulate_covariates(init_dict, streams=None):
     """The function simulates the covariates for the choice and the output functions."""
     # Distribute information
     num_agents = init_dict['SIMULATION']['agents']
+    if streams is None:
+        streams = random_streams(init_dict)
 
     # Construct auxiliary information
 
     num_covars = len(init_dict['AUX']['types'])
     types = init_dict['AUX']['types']
 
-    # As our baseline we simulate covariates from a standard normal distribution.
-    means = np.tile(0.0, num_covars)
-    covs = np.identity(num_covars)
-    X = np.random.multivariate_normal(means, covs, num_agents)
+    # As our baseline we simulate covariates from independent standard normal distributions.
+    X = streams['X'].standard_normal((num_agents, num_covars))
 
     # We now perform some selective replacements.
     X[:, 0] = 1.0
     for i in list(range(num_covars)):
-        if isinstance(types[i], list):
-            if types[i][0] == 'binary':
-                if i != 0:
-                    frac = types[i][1]
-                    binary = np.random.binomial(1, frac, size=num_agents)
-                    X[:, i] = binary
-                else:
-                    pass
-            elif types[i][0] == 'categorical':
-                prob = types[i][2]
-                cat = types[i][1]
-                rand = np.random.choice(cat, size=num_agents, p=prob)
-                X[:, i] = rand
+        if is_drawn_separately(i, types[i]):
+            X[:, i] = draw_covariate(streams[i], types[i], num_agents)
 
     return X
 
 
-def simulate_unobservables(init_dict):
+def simulate_unobservables(init_dict, streams=None, sampler=None):
     """The function simulates the unobservable error terms."""
     num_agents = init_dict['SIMULATION']['agents']
-    cov = construct_covariance_matrix(init_dict)
+    if streams is None:
+        streams = random_streams(init_dict)
+    if sampler is None:
+        sampler = create_sampler(init_dict)
 
-    U = np.random.multivariate_normal(np.zeros(3), cov, num_agents)
+    U = draw_unobservables(sampler, streams['U'], num_agents)
     V = np.array(U[:, 2])
 
     return U, V
 
 
+def create_sampler(init_dict):
+    """The function creates the sampler of the unobservables. The factor of the covariance matrix is
+    computed only once for each covariance matrix and random number generator, the draws of a
+    sampler are written into buffers that are reused across calls.
+    """
+    cov = construct_covariance_matrix(init_dict)
+    is_legacy = init_dict['SIMULATION']['rng'] == 'legacy'
+
+    key_ = (is_legacy, cov.tobytes())
+    if key_ not in FACTORS.keys():
+        if len(FACTORS) >= 128:
+            FACTORS.clear()
+        FACTORS[key_] = covariance_factor(cov, is_legacy)
+
+    return {'factor': FACTORS[key_], 'normals': np.empty((0, 3)), 'draws': np.empty((0, 3))}
+
+
+def covariance_factor(cov, is_legacy):
+    """The function returns the factor of the covariance matrix that transforms standard normal
+    draws. The legacy generator requires the factor that numpy's multivariate_normal derives from
+    the singular value decomposition to reproduce the samples of the earlier releases. Otherwise
+    the Cholesky factor is used, unless the covariance matrix is singular.
+    """
+    if not is_legacy:
+        try:
+            return np.linalg.cholesky(cov).T
+        except np.linalg.LinAlgError:
+            pass
+    _, s, v = np.linalg.svd(cov)
+    return np.sqrt(s)[:, None] * v
+
+
+def draw_unobservables(sampler, random_state, num_agents):
+    """The function draws the unobservables for the next agents. The returned array is a view of
+    the sampler's buffer that is overwritten by the next draw.
+    """
+    if sampler['draws'].shape[0] < num_agents:
+        sampler['normals'], sampler['draws'] = np.empty((num_agents, 3)), np.empty((num_agents, 3))
+    normals, draws = sampler['normals'][:num_agents], sampler['draws'][:num_agents]
+
+    # Only the Generator objects are able to draw into an existing array.
+    if isinstance(random_state, np.random.RandomState):
+        normals[:] = random_state.standard_normal((num_agents, 3))
+    else:
+        random_state.standard_normal(out=normals)
+
+    return np.dot(normals, sampler['factor'], out=draws)
+
+
+def draw_covariate(random_state, type_, num_agents):
+    """The function draws a binary or categorical covariate."""
+    if type_[0] == 'binary':
+        return random_state.binomial(1, type_[1], size=num_agents)
+    else:
+        return random_state.choice(type_[1], size=num_agents, p=type_[2])
+
+
+def is_drawn_separately(i, type_):
+    """The function indicates whether the covariate is replaced by binary or categorical draws."""
+    return isinstance(type_, list) and type_[0] in ['binary', 'categorical'] and \
+        not (i == 0 and type_[0] == 'binary')
+
+
 def simulate_outcomes(init_dict, X, U, V):
     """The function simulates the potential outcomes Y0 and Y1, the resulting treatment dummy D and
     the realized outcome Y.
     """
-    X = pd.DataFrame(X)
-    Z = X[[i - 1 for i in init_dict['CHOICE']['order']]].as_matrix()
-    X_treated = X[[i - 1 for i in init_dict['TREATED']['order']]].as_matrix()
-    X_untreated = X[[i - 1 for i in init_dict['UNTREATED']['order']]].as_matrix()
+    Z = X[:, np.array(init_dict['CHOICE']['order']) - 1]
+    X_treated = X[:, np.array(init_dict['TREATED']['order']) - 1]
+    X_untreated = X[:, np.array(init_dict['UNTREATED']['order']) - 1]
     # Distribute information
     coeffs_untreated = init_dict['UNTREATED']['all']
     coeffs_treated = init_dict['TREATED']['all']
@@ -81,37 +166,57 @@ def simulate_outcomes(init_dict, X, U, V):
 
 
 def write_output(init_dict, Y, D, X, Y_1, Y_0, U, V):
-    """The function converts the simulated variables to a panda data frame and saves the data in a
-    txt and a pickle file.
+    """The function converts the simulated variables to a panda data frame and saves the data in
+    the output formats that are specified in the initialization file.
     """
-    # Distribute information
-    source = init_dict['SIMULATION']['source']
+    df = construct_data_frame(init_dict, Y, D, X, Y_1, Y_0, U, V)
+    write_data(df, init_dict['SIMULATION']['source'], init_dict['SIMULATION']['formats'])
+    return df
+
 
+def construct_data_frame(init_dict, Y, D, X, Y_1, Y_0, U, V):
+    """The function converts the simulated variables to a panda data frame with the labels of the
+    initialization file.
+    """
     # Stack arrays
     data = np.column_stack((Y, D, X, Y_1, Y_0, U[:, 0], U[:, 1], V))
 
     # Construct list of column labels
     dep, indicator = init_dict['ESTIMATION']['dependent'], init_dict['ESTIMATION']['indicator']
-    column = [dep, indicator]
-
-    for i in list(range(X.shape[1])):
-        str_ = 'X' + str(i)
-        column.append(str_)
+    column = [dep, indicator] + init_dict['varnames'][:X.shape[1]]
     column += [dep + '1', dep + '0', 'U1', 'U0', 'V']
 
-    # Generate data frame, save it with pickle and create a txt file
+    # Generate data frame
     df = pd.DataFrame(data=data, columns=column)
-    df[indicator] = df[indicator].apply(np.int64)
-    df2 = pd.DataFrame()
-    for i in df.columns.values:
-        if "X" in i:
-            df2[init_dict['varnames'][int(i[1:5])]] = df[i]
-        else:
-            df2[i] = df[i]
-    df2.to_pickle(source + '.grmpy.pkl')
-    with open(source + '.grmpy.txt', 'w') as file_:
-        df2.to_string(file_, index=False, na_rep='.', col_space=15, justify='left')
-    return df2
+    df[indicator] = df[indicator].astype(np.int64)
+    return df
+
+
+def write_data(df, source, formats):
+    """The function saves the data frame in each of the requested output formats."""
+    for format_ in formats:
+        fname = source + '.grmpy.' + format_
+        if format_ == 'pkl':
+            df.to_pickle(fname)
+        elif format_ == 'txt':
+            with open(fname, 'w') as file_:
+                df.to_string(file_, index=False, na_rep='.', col_space=15, justify='left')
+        elif format_ in ['parquet', 'feather']:
+            if not hasattr(df, 'to_' + format_):
+                msg = 'The {} format is not supported by the installed version of pandas.' \
+                    .format(format_)
+                raise UserError(msg)
+            try:
+                if format_ == 'parquet':
+                    df.to_parquet(fname, index=False)
+                else:
+                    df.reset_index(drop=True).to_feather(fname)
+            except ImportError:
+                msg = 'The {} format requires the pyarrow package, which is not installed.' \
+                    .format(format_)
+                raise UserError(msg)
+        elif format_ == 'npz':
+            np.savez(fname, **OrderedDict((label, df[label].values) for label in df.columns))
 
 
 def construct_all_coefficients(init_dict):
@@ -123,14 +228,45 @@ def construct_all_coefficients(init_dict):
     return coeffs_all
 
 
-def print_info(init_dict, data_frame):
-    """The function writes an info file for the specific data frame."""
+def data_summary(init_dict, data_frame):
+    """The function collects the descriptive statistics of the simulated data frame that are
+    reported in the info file.
+    """
+    dep, indicator = init_dict['ESTIMATION']['dependent'], init_dict['ESTIMATION']['indicator']
+
+    summary = dict()
+    summary['num_agents'] = data_frame.shape[0]
+    summary['num_treated'] = int((data_frame[indicator] == 1).sum())
+    summary['num_untreated'] = int((data_frame[indicator] == 0).sum())
+
+    for label in ['Outcomes', 'Effects']:
+        summary[label] = dict()
+        for group in ['All', 'Treated', 'Untreated']:
+
+            if label == 'Outcomes':
+                data = data_frame[dep]
+            else:
+                data = data_frame[dep + '1'] - data_frame[dep + '0']
+
+            if group == 'Treated':
+                data = data[data_frame[indicator] == 1]
+            elif group == 'Untreated':
+                data = data[data_frame[indicator] == 0]
+
+            summary[label][group] = list(data.describe().tolist()[i] for i in [1, 2, 4, 5, 6])
+
+    summary['x_mean'] = data_frame[init_dict['AUX']['labels']['OUTCOMES']].mean().values
+
+    return summary
+
+
+def print_info(init_dict, summary):
+    """The function writes an info file for the descriptive statistics of the simulated data."""
 
     # Distribute information
     coeffs_untreated = init_dict['UNTREATED']['all']
     coeffs_treated = init_dict['TREATED']['all']
     source = init_dict['SIMULATION']['source']
-    dep, indicator = init_dict['ESTIMATION']['dependent'], init_dict['ESTIMATION']['indicator']
 
     # Construct auxiliary information
     coeffs_all = construct_all_coefficients(init_dict)
@@ -142,8 +278,7 @@ def print_info(init_dict, data_frame):
         header = '\n\n Number of Observations \n\n'
         file_.write(header)
 
-        info_ = [data_frame.shape[0], (data_frame[indicator] == 1).sum(),
-                 (data_frame[indicator] == 0).sum()]
+        info_ = [summary['num_agents'], summary['num_treated'], summary['num_untreated']]
 
         fmt = '  {:<10}' + ' {:>20}' * 1 + '\n\n'
         file_.write(fmt.format(*['', 'Count']))
@@ -163,30 +298,15 @@ def print_info(init_dict, data_frame):
             file_.write(fmt.format(*args))
 
             for group in ['All', 'Treated', 'Untreated']:
-
-                if label == 'Outcomes':
-                    data = data_frame[dep]
-                elif label == 'Effects':
-                    data = data_frame[dep + '1'] - data_frame[dep + '0']
-                else:
-                    raise AssertionError
-
-                if group == 'Treated':
-                    data = data[data_frame[indicator] == 1]
-                elif group == 'Untreated':
-                    data = data[data_frame[indicator] == 0]
-                else:
-                    pass
-                fmt = '  {:<10}' + ' {:>20.4f}' * 5 + '\n'
-                info = list(data.describe().tolist()[i] for i in [1, 2, 4, 5, 6])
-                if pd.isnull(info).all():
-                    fmt = '  {:<10}' + ' {:>20}' * 5 + '\n'
-                    info = ['---'] * 5
-                elif pd.isnull(info[1]):
-                    info[1] = '---'
-                    fmt = '  {:<10}' ' {:>20.4f}' ' {:>20}' + ' {:>20.4f}' * 3 + '\n'
-
-                file_.write(fmt.format(*[group] + info))
+                # Statistics that are not defined for the group are reported as missing.
+                info = list(summary[label][group])
+                fmt = '  {:<10}'
+                for i, value in enumerate(info):
+                    if pd.isnull(value):
+                        info[i], fmt = '---', fmt + ' {:>20}'
+                    else:
+                        fmt += ' {:>20.4f}'
+                file_.write((fmt + '\n').format(*[group] + info))
 
         # Implement the criteria function value , the MTE and parameterization
         header = '\n\n {} \n\n'.format('Criterion Function')
@@ -204,8 +324,8 @@ def print_info(init_dict, data_frame):
         args = [str(i) + '%' for i in quantiles]
         quantiles = [i * 0.01 for i in quantiles]
 
-        help_ = list(set(init_dict['TREATED']['order'] + init_dict['UNTREATED']['order']))
-        x = data_frame[[init_dict['varnames'][i - 1] for i in help_]]
+        # The MTE depends on the covariates only through their sample mean.
+        x = np.array(summary['x_mean'], ndmin=2)
         value = mte_information(coeffs_treated, coeffs_untreated, cov, quantiles, x, init_dict)
         str_ = '  {0:>10} {1:>20}\n\n'.format('Quantile', 'Value')
         file_.write(str_)
@@ -227,25 +347,16 @@ def mte_information(coeffs_treated, coeffs_untreated, cov, quantiles, x, dict_):
     """The function calculates the marginal treatment effect for pre specified quantiles of the
     collected unobservable variables.
     """
-    # Construct auxiliary information
-    if dict_['TREATED']['order'] != dict_['UNTREATED']['order']:
-        para_diff = []
-        for i in set(dict_['TREATED']['order'] + dict_['UNTREATED']['order']):
-            if i in dict_['TREATED']['order'] and i in dict_['UNTREATED']['order']:
-                index_treated = dict_['TREATED']['order'].index(i)
-                index_untreated = dict_['UNTREATED']['order'].index(i)
-                diff = dict_['TREATED']['all'][index_treated] \
-                    - dict_['UNTREATED']['all'][index_untreated]
-            elif i in dict_['TREATED']['order'] and i not in dict_['UNTREATED']['order']:
-                index = dict_['TREATED']['order'].index(i)
-                diff = dict_['TREATED']['all'][index]
-
-            elif i not in dict_['TREATED']['order'] and i in dict_['UNTREATED']['order']:
-                index = dict_['UNTREATED']['order'].index(i)
-                diff = - dict_['UNTREATED']['all'][index]
-            para_diff += [diff]
-    else:
-        para_diff = coeffs_treated - coeffs_untreated
+    # Construct auxiliary information, the coefficients of both outcomes are aligned with the
+    # union of their covariates.
+    union = sorted(set(dict_['TREATED']['order'] + dict_['UNTREATED']['order']))
+    positions = {j: index for index, j in enumerate(union)}
+    para_diff = np.zeros(len(union))
+    for j, coeff in zip(dict_['TREATED']['order'], coeffs_treated):
+        para_diff[positions[j]] += coeff
+    for j, coeff in zip(dict_['UNTREATED']['order'], coeffs_untreated):
+        para_diff[positions[j]] -= coeff
+
     MTE = []
     for i in quantiles:
         if cov[2, 2] == 0.00:
@@ -0,0 +1,256 @@
+"""The module provides the streaming simulation process. The agents are simulated in chunks of fixed
+size and each chunk is appended to the output files right away, so that the size of the simulated
+sample is not limited by the available memory. The random components of each chunk are drawn from
+the same streams of random numbers as in the simulation of the whole sample at once, so the
+unobservables, the covariates and the treatment decisions are identical. The outcomes agree up to
+rounding, as the products of the covariates and the coefficients are computed in chunks.
+"""
+import zipfile
+import shutil
+import os
+
+from numpy.lib.format import open_memmap
+import numpy as np
+
+try:
+    import pyarrow.parquet
+    import pyarrow
+except ImportError:
+    pyarrow = None
+
+from grmpy.simulate.simulate_auxiliary import construct_data_frame
+from grmpy.simulate.simulate_auxiliary import is_drawn_separately
+from grmpy.simulate.simulate_auxiliary import draw_unobservables
+from grmpy.simulate.simulate_auxiliary import simulate_outcomes
+from grmpy.simulate.simulate_auxiliary import draw_covariate
+from grmpy.simulate.simulate_auxiliary import create_sampler
+from grmpy.simulate.simulate_auxiliary import random_streams
+from grmpy.check.custom_exceptions import UserError
+
+
+def simulate_stream(init_dict):
+    """The function simulates the generalized Roy model in chunks of agents, writes each chunk to
+    the output files and returns the descriptive statistics of the simulated sample.
+    """
+    # Distribute information
+    num_agents = init_dict['SIMULATION']['agents']
+    chunksize = init_dict['SIMULATION']['chunksize']
+
+    # The independent streams of the Generator objects are consumed chunk by chunk as they are,
+    # the single legacy stream is split in its components first.
+    if init_dict['SIMULATION']['rng'] == 'legacy':
+        streams = dict()
+        for key_, state in random_states(init_dict).items():
+            streams[key_] = np.random.RandomState()
+            streams[key_].set_state(state)
+    else:
+        streams = random_streams(init_dict)
+
+    sampler = create_sampler(init_dict)
+
+    writers = open_writers(init_dict)
+    summary = None
+    try:
+        for start, stop in agent_blocks(num_agents, chunksize):
+            U, V, X = simulate_chunk(init_dict, streams, sampler, stop - start)
+            Y, D, Y_1, Y_0 = simulate_outcomes(init_dict, X, U, V)
+            df = construct_data_frame(init_dict, Y, D, X, Y_1, Y_0, U, V)
+            write_chunk(writers, df, start, num_agents)
+            summary = update_summary(init_dict, summary, df)
+    finally:
+        close_writers(writers)
+
+    return finalize_summary(summary)
+
+
+def random_states(init_dict):
+    """The function returns the state of the legacy random number generator at the beginning of
+    each component of the simulation. The components are drawn one after another in the simulation
+    of the whole sample, first the unobservables for all agents, then the normal covariates and then
+    the binary and categorical covariates in the order of the columns.
+    """
+    # Distribute information
+    num_agents = init_dict['SIMULATION']['agents']
+    chunksize = init_dict['SIMULATION']['chunksize']
+    types = init_dict['AUX']['types']
+
+    random_state = np.random.RandomState(init_dict['SIMULATION']['seed'])
+    blocks = agent_blocks(num_agents, chunksize)
+
+    states = dict()
+    states['U'] = random_state.get_state()
+    for start, stop in blocks:
+        random_state.standard_normal((stop - start, 3))
+
+    states['X'] = random_state.get_state()
+    for start, stop in blocks:
+        random_state.standard_normal((stop - start, len(types)))
+
+    for i, type_ in enumerate(types):
+        if is_drawn_separately(i, type_):
+            states[i] = random_state.get_state()
+            for start, stop in blocks:
+                draw_covariate(random_state, type_, stop - start)
+
+    return states
+
+
+def simulate_chunk(init_dict, streams, sampler, num_agents):
+    """The function simulates the unobservables and covariates for the next chunk of agents."""
+    types = init_dict['AUX']['types']
+
+    U = draw_unobservables(sampler, streams['U'], num_agents)
+    V = np.array(U[:, 2])
+
+    X = streams['X'].standard_normal((num_agents, len(types)))
+    X[:, 0] = 1.0
+    for i, type_ in enumerate(types):
+        if is_drawn_separately(i, type_):
+            X[:, i] = draw_covariate(streams[i], type_, num_agents)
+
+    return U, V, X
+
+
+def agent_blocks(num_agents, chunksize):
+    """The function returns the first and the last agent of each chunk."""
+    return [(start, min(start + chunksize, num_agents))
+            for start in range(0, num_agents, chunksize)]
+
+
+def open_writers(init_dict):
+    """The function prepares the output files for the incremental output of the simulated data."""
+    source = init_dict['SIMULATION']['source']
+
+    writers = dict()
+    for format_ in init_dict['SIMULATION']['formats']:
+        fname = source + '.grmpy.' + format_
+        if format_ == 'txt':
+            writers[format_] = open(fname, 'w')
+        elif format_ in ['parquet', 'feather']:
+            if pyarrow is None:
+                msg = 'The {} format requires the pyarrow package, which is not installed.' \
+                    .format(format_)
+                raise UserError(msg)
+            writers[format_] = {'fname': fname, 'writer': None}
+        elif format_ == 'npz':
+            # The columns are collected in temporary files and packed in the archive at the end.
+            writers[format_] = {'fname': fname, 'directory': fname + '.tmp', 'columns': None}
+            if not os.path.isdir(fname + '.tmp'):
+                os.makedirs(fname + '.tmp')
+
+    return writers
+
+
+def write_chunk(writers, df, start, num_agents):
+    """The function appends a chunk of agents to each of the output files."""
+    for format_, writer in writers.items():
+        if format_ == 'txt':
+            if start > 0:
+                writer.write('\n')
+            df.to_string(writer, index=False, header=(start == 0), na_rep='.', col_space=15,
+                         justify='left')
+        elif format_ in ['parquet', 'feather']:
+            table = pyarrow.Table.from_pandas(df, preserve_index=False)
+            if writer['writer'] is None:
+                if format_ == 'parquet':
+                    writer['writer'] = pyarrow.parquet.ParquetWriter(writer['fname'], table.schema)
+                else:
+                    writer['writer'] = pyarrow.RecordBatchFileWriter(writer['fname'], table.schema)
+            writer['writer'].write_table(table)
+        elif format_ == 'npz':
+            if writer['columns'] is None:
+                writer['columns'] = []
+                for label in df.columns:
+                    fname = os.path.join(writer['directory'], label + '.npy')
+                    writer['columns'] += [(label, open_memmap(
+                        fname, mode='w+', dtype=df[label].dtype, shape=(num_agents,)))]
+            for label, array in writer['columns']:
+                array[start:start + df.shape[0]] = df[label].values
+
+
+def close_writers(writers):
+    """The function completes the output files."""
+    for format_, writer in writers.items():
+        if format_ == 'txt':
+            writer.close()
+        elif format_ in ['parquet', 'feather']:
+            if writer['writer'] is not None:
+                writer['writer'].close()
+        elif format_ == 'npz':
+            # The archive has the same uncompressed layout as the files that numpy.savez writes.
+            if writer['columns'] is not None:
+                with zipfile.ZipFile(writer['fname'], 'w', zipfile.ZIP_STORED,
+                                     allowZip64=True) as archive:
+                    for label, array in writer['columns']:
+                        array.flush()
+                        archive.write(array.filename, arcname=label + '.npy')
+                writer['columns'] = None
+            shutil.rmtree(writer['directory'])
+
+
+def update_summary(init_dict, summary, df):
+    """The function adds the descriptive statistics of a chunk of agents to the running summary.
+    Means and variances are combined with the pairwise updating formula of Chan et al. (1979).
+    """
+    dep, indicator = init_dict['ESTIMATION']['dependent'], init_dict['ESTIMATION']['indicator']
+    labels = init_dict['AUX']['labels']['OUTCOMES']
+
+    if summary is None:
+        summary = {'num_agents': 0, 'num_treated': 0, 'num_untreated': 0,
+                   'x_sum': np.zeros(len(labels))}
+        for label in ['Outcomes', 'Effects']:
+            summary[label] = {group: [0, 0.0, 0.0] for group in ['All', 'Treated', 'Untreated']}
+
+    summary['num_agents'] += df.shape[0]
+    summary['num_treated'] += int((df[indicator] == 1).sum())
+    summary['num_untreated'] += int((df[indicator] == 0).sum())
+    summary['x_sum'] += df[labels].values.sum(axis=0)
+
+    for label in ['Outcomes', 'Effects']:
+        if label == 'Outcomes':
+            data = df[dep].values
+        else:
+            data = df[dep + '1'].values - df[dep + '0'].values
+
+        for group in ['All', 'Treated', 'Untreated']:
+            if group == 'Treated':
+                chunk = data[df[indicator].values == 1]
+            elif group == 'Untreated':
+                chunk = data[df[indicator].values == 0]
+            else:
+                chunk = data
+            if chunk.size == 0:
+                continue
+
+            count, mean, m2 = summary[label][group]
+            count_chunk, mean_chunk = chunk.size, chunk.mean()
+            m2_chunk = ((chunk - mean_chunk) ** 2).sum()
+
+            delta = mean_chunk - mean
+            total = count + count_chunk
+            mean += delta * count_chunk / total
+            m2 += m2_chunk + delta ** 2 * count * count_chunk / total
+            summary[label][group] = [total, mean, m2]
+
+    return summary
+
+
+def finalize_summary(summary):
+    """The function converts the running summary in the descriptive statistics of the simulated
+    sample. The quantiles of the distributions are not available in the streaming simulation.
+    """
+    rslt = dict()
+    for key_ in ['num_agents', 'num_treated', 'num_untreated']:
+        rslt[key_] = summary[key_]
+    rslt['x_mean'] = summary['x_sum'] / summary['num_agents']
+
+    for label in ['Outcomes', 'Effects']:
+        rslt[label] = dict()
+        for group in ['All', 'Treated', 'Untreated']:
+            count, mean, m2 = summary[label][group]
+            if count == 0:
+                mean = np.nan
+            std = np.sqrt(m2 / (count - 1)) if count > 1 else np.nan
+            rslt[label][group] = [mean, std, np.nan, np.nan, np.nan]
+
+    return rslt
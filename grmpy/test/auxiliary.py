@@ -1,4 +1,5 @@
 """The module provides basic auxiliary functions for the test modules."""
+import shutil
 import shlex
 import glob
 import os
@@ -10,19 +11,27 @@ def cleanup(options=None):
 
     if options is None:
         for f in fnames:
-            os.remove(f)
+            remove(f)
     elif options == 'regression':
         for f in fnames:
             if f.startswith('regression'):
                 pass
             else:
-                os.remove(f)
+                remove(f)
     elif options == 'init_file':
         for f in fnames:
             if f.startswith('test.grmpy'):
                 pass
             else:
-                os.remove(f)
+                remove(f)
+
+
+def remove(fname):
+    """The function deletes an output file or an output directory such as a data cache."""
+    if os.path.isdir(fname):
+        shutil.rmtree(fname)
+    else:
+        os.remove(fname)
 
 
 def read_desc(fname):
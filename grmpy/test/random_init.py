@@ -153,6 +153,8 @@ def print_dict(dict_, file_name='test'):
     """The function creates an init file from a given dictionary."""
     labels = ['SIMULATION', 'ESTIMATION', 'TREATED', 'UNTREATED', 'CHOICE', 'DIST', 'SCIPY-BFGS',
               'SCIPY-POWELL']
+    labels += [label for label in ['SCIPY-TRUST-NCG', 'SCIPY-TRUST-EXACT', 'GRMPY-NEWTON',
+                                   'GRMPY-BHHH', 'GRMPY-ADAM'] if label in dict_.keys()]
     write_nonbinary = np.random.random_sample() < 0.5
 
     with open(file_name + '.grmpy.ini', 'w') as file_:
@@ -160,21 +162,48 @@ def print_dict(dict_, file_name='test'):
         for label in labels:
             file_.write('   {}'.format(label) + '\n\n')
 
-            if label in ['SIMULATION', 'ESTIMATION', 'SCIPY-BFGS', 'SCIPY-POWELL']:
+            if label in ['SIMULATION', 'ESTIMATION', 'SCIPY-BFGS', 'SCIPY-POWELL',
+                         'SCIPY-TRUST-NCG', 'SCIPY-TRUST-EXACT', 'GRMPY-NEWTON', 'GRMPY-BHHH',
+                         'GRMPY-ADAM']:
                 if label == 'SIMULATION':
-                    structure = ['seed', 'agents', 'source']
+                    structure = ['seed', 'agents', 'source', 'formats', 'chunksize', 'rng']
                 elif label == 'ESTIMATION':
                     structure = ['file', 'start', 'agents', 'optimizer', 'maxiter', 'dependent',
-                                 'indicator']
+                                 'indicator', 'se_method', 'workers', 'chunksize', 'stream',
+                                 'trace', 'trace_file', 'stages', 'starts', 'rounds', 'margin',
+                                 'spread', 'processes', 'checkpoint', 'interval', 'budget',
+                                 'start_file', 'cache', 'cache_size']
                 elif label == 'SCIPY-BFGS':
                     structure = ['gtol', 'eps']
+                elif label in ['SCIPY-TRUST-NCG', 'SCIPY-TRUST-EXACT', 'GRMPY-NEWTON',
+                               'GRMPY-BHHH']:
+                    structure = ['gtol']
+                elif label == 'GRMPY-ADAM':
+                    structure = ['batch', 'rate', 'decay', 'refine']
                 else:
                     structure = ['xtol', 'ftol']
                 for key_ in structure:
-                    if key_ in ['source', 'file', 'norm', 'optimizer', 'start']:
+                    is_optional = key_ in ['se_method', 'workers', 'chunksize', 'stream', 'formats',
+                                           'rng', 'trace', 'trace_file', 'stages', 'batch', 'rate',
+                                           'decay', 'refine', 'starts', 'rounds', 'margin',
+                                           'spread', 'processes', 'checkpoint', 'interval',
+                                           'budget', 'start_file', 'cache', 'cache_size']
+                    if is_optional and key_ not in dict_[label].keys():
+                        continue
+                    if key_ == 'formats':
+                        str_ = '        {0:<25} {1:>20}\n'
+                        file_.write(str_.format(key_, ','.join(dict_[label][key_]) or 'none'))
+                        continue
+                    if key_ == 'stages':
+                        str_ = '        {0:<25} {1:>20}\n'
+                        file_.write(str_.format(key_, ','.join(str(i) for i in dict_[label][key_])))
+                        continue
+                    if key_ in ['source', 'file', 'norm', 'optimizer', 'start', 'se_method',
+                                'rng', 'trace_file', 'checkpoint', 'start_file', 'cache']:
                         str_ = '        {0:<25} {1:>20}\n'
                         file_.write(str_.format(key_, dict_[label][key_]))
-                    elif key_ in ['gtol', 'xtol', 'ftol', 'norm', 'eps']:
+                    elif key_ in ['gtol', 'xtol', 'ftol', 'norm', 'eps', 'rate', 'decay',
+                                  'margin', 'spread', 'interval', 'budget', 'cache_size']:
                         str_ = '        {0:<13} {1:>32}\n'
                         file_.write(str_.format(key_, dict_[label][key_]))
                     else:
@@ -1,21 +1,75 @@
 """The module provides unit tests for different aspects of the simulation process."""
+import shutil
+import glob
+import json
 import os
 
+from statsmodels.tools.numdiff import approx_fprime
+from statsmodels.tools.numdiff import approx_hess3
+from scipy.stats import norm
+import statsmodels.api as sm
 import pandas as pd
 import numpy as np
+import pytest
+
+try:
+    import pyarrow
+except ImportError:
+    pyarrow = None
 
 from grmpy.simulate.simulate_auxiliary import construct_covariance_matrix
 from grmpy.estimate.estimate_auxiliary import backward_transformation
 from grmpy.estimate.estimate_auxiliary import start_value_adjustment
+from grmpy.estimate.estimate_auxiliary import likelihood_contributions
+from grmpy.estimate.estimate_auxiliary import log_likelihood_gradient
+from grmpy.estimate.estimate_auxiliary import calculate_criteria
+from grmpy.estimate.estimate_auxiliary import gradient_interface
+from grmpy.estimate.estimate_auxiliary import hessian_interface
+from grmpy.estimate.estimate_checkpoint import restore_random_state
+from grmpy.estimate.estimate_likelihood import information_matrices
+from grmpy.estimate.estimate_cache import cache_statistics
+from grmpy.estimate.estimate_result import save_result
+from grmpy.estimate.estimate_cache import cache_report
+from grmpy.estimate.estimate_result import load_result
+from grmpy.estimate.estimate_checkpoint import create_checkpoint
+from grmpy.estimate.estimate_checkpoint import write_checkpoint
+from grmpy.estimate.estimate_checkpoint import STATUS_BUDGET
+from grmpy.estimate.estimate_likelihood import prepare_stream
+from grmpy.estimate.estimate_likelihood import subsample_data
+from grmpy.estimate.estimate_likelihood import prepare_data
+from grmpy.estimate.estimate_likelihood import MEMO_SIZE
+from grmpy.estimate.estimate_data import invalidate_data
+from grmpy.estimate import estimate_data
+from grmpy.estimate.estimate_data import load_cache
+from grmpy.estimate.estimate_data import load_data
+from grmpy.estimate.estimate_data import DATA
+from grmpy.estimate.estimate_start import auto_start_values
+from grmpy.estimate.estimate_trace import record_evaluation
+from grmpy.estimate.estimate_trace import create_trace
+from grmpy.estimate.estimate_trace import trace_values
+from grmpy.estimate.estimate_trace import close_trace
+from grmpy.estimate.estimate_auxiliary import log_likelihood
 from grmpy.simulate.simulate_auxiliary import mte_information
+from grmpy.simulate.simulate_auxiliary import draw_unobservables
+from grmpy.simulate.simulate_auxiliary import covariance_factor
+from grmpy.simulate.simulate_auxiliary import random_streams
+from grmpy.simulate.simulate_auxiliary import create_sampler
+from grmpy.simulate.simulate_auxiliary import data_summary
 from grmpy.estimate.estimate_auxiliary import start_values
 from grmpy.test.random_init import generate_random_dict
 from grmpy.grmpy_config import TEST_RESOURCES_DIR
+from grmpy.check.custom_exceptions import UserError
+from grmpy.check.check import check_initialization_dict
 from grmpy.test.random_init import print_dict
+from grmpy.simulate.simulate import simulate_in_memory
+from grmpy.estimate.estimate import estimate_in_memory
 from grmpy.simulate.simulate import simulate
 from grmpy.estimate.estimate import estimate
 from grmpy.check.auxiliary import read_data
 from grmpy.test.auxiliary import cleanup
+from grmpy.read.read import process_init_dict
+from grmpy.read.read import invalidate
+from grmpy.read.read import SPECS
 from grmpy.read.read import read
 import grmpy
 
@@ -313,3 +367,1005 @@ def test13():
         np.testing.assert_equal(columns, real_column_values)
 
     cleanup()
+
+
+def test14():
+    """This test ensures that the vectorized log-likelihood function returns the same criterion
+    function value as a straightforward implementation based on the data frame, irrespective of
+    whether the data is passed as a data frame or in its prepared form.
+    """
+    for _ in range(10):
+        constr = dict()
+        constr['DETERMINISTIC'], constr['AGENTS'] = False, 1000
+        generate_random_dict(constr)
+        init_dict = read('test.grmpy.ini')
+        df = simulate('test.grmpy.ini')
+        x0 = backward_transformation(start_values(init_dict, df, 'init'))
+
+        num_treated = init_dict['AUX']['num_covars_treated']
+        num_untreated = num_treated + init_dict['AUX']['num_covars_untreated']
+        gamma = x0[num_untreated:-4]
+        Z = df[[init_dict['varnames'][j - 1] for j in init_dict['CHOICE']['order']]]
+        likl = []
+        for key_, beta, sd, rho in [('TREATED', x0[:num_treated], x0[-4], x0[-3]),
+                                    ('UNTREATED', x0[num_treated:num_untreated], x0[-2], x0[-1])]:
+            X = df[[init_dict['varnames'][j - 1] for j in init_dict[key_]['order']]]
+            part1 = (df.Y - np.dot(X, beta)) / sd
+            part2 = (np.dot(Z, gamma) - rho * part1) / np.sqrt(1 - rho ** 2)
+            if key_ == 'TREATED':
+                contrib = norm.pdf(part1) / sd * norm.cdf(part2)
+                likl += contrib[df.D == 1].tolist()
+            else:
+                contrib = norm.pdf(part1) / sd * (1.0 - norm.cdf(part2))
+                likl += contrib[df.D == 0].tolist()
+        expected = - np.mean(np.log(np.clip(likl, 1e-20, np.inf)))
+
+        prep = prepare_data(init_dict, df)
+        np.testing.assert_almost_equal(log_likelihood(x0, init_dict, df), expected)
+        np.testing.assert_almost_equal(log_likelihood(x0, init_dict, prep), expected)
+
+    cleanup()
+
+
+def test15():
+    """This test checks the analytical gradient of the criterion function with respect to the
+    transformed parameters against a finite difference approximation.
+    """
+    for _ in range(10):
+        constr = dict()
+        constr['DETERMINISTIC'], constr['AGENTS'] = False, 1000
+        generate_random_dict(constr)
+        init_dict = read('test.grmpy.ini')
+        df = simulate('test.grmpy.ini')
+        prep = prepare_data(init_dict, df)
+
+        x0 = start_values(init_dict, df, 'init')
+        x0 += np.random.normal(0.0, 0.1, len(x0))
+
+        numerical = approx_fprime(
+            x0, lambda x: calculate_criteria(init_dict, prep, x), centered=True)
+        analytical = gradient_interface(x0, init_dict, prep)
+        np.testing.assert_allclose(analytical, numerical, rtol=1e-4, atol=1e-6)
+
+    cleanup()
+
+
+def test16():
+    """This test checks the analytical hessian matrix of the criterion function against a finite
+    difference approximation and ensures that all standard error methods return their results in
+    the same form.
+    """
+    for _ in range(5):
+        constr = dict()
+        constr['DETERMINISTIC'], constr['AGENTS'] = False, 1000
+        generate_random_dict(constr)
+        init_dict = read('test.grmpy.ini')
+        df = simulate('test.grmpy.ini')
+        prep = prepare_data(init_dict, df)
+
+        x0 = backward_transformation(start_values(init_dict, df, 'init'))
+        numerical = approx_hess3(x0, log_likelihood, args=(init_dict, prep))
+        analytical, opg = information_matrices(x0, init_dict, prep)
+        np.testing.assert_allclose(analytical, numerical, rtol=1e-3, atol=1e-4)
+        np.testing.assert_array_almost_equal(opg, opg.T)
+
+    constr = dict()
+    constr['DETERMINISTIC'], constr['AGENTS'], constr['MAXITER'] = False, 1000, 5
+    dict_ = generate_random_dict(constr)
+    for method in ['hessian', 'opg', 'sandwich', 'numerical']:
+        dict_['ESTIMATION']['se_method'] = method
+        print_dict(dict_)
+        simulate('test.grmpy.ini')
+        rslt = estimate('test.grmpy.ini')
+        num_paras = len(rslt['AUX']['x_internal'])
+        np.testing.assert_equal(len(rslt['AUX']['standard_errors']), num_paras)
+        np.testing.assert_equal(len(rslt['AUX']['confidence_intervals']), num_paras)
+        if not isinstance(rslt['AUX']['hess_inv'], str):
+            np.testing.assert_equal(rslt['AUX']['hess_inv'].shape, (num_paras, num_paras))
+
+    cleanup()
+
+
+def test17():
+    """This test ensures that the individual log-likelihood contributions and scores are consistent
+    with the criterion function, its gradient and the outer product of the scores. Further it
+    checks that both arrays follow the order of the agents in the data set.
+    """
+    for _ in range(5):
+        constr = dict()
+        constr['DETERMINISTIC'], constr['AGENTS'] = False, 1000
+        generate_random_dict(constr)
+        init_dict = read('test.grmpy.ini')
+        df = simulate('test.grmpy.ini')
+        prep = prepare_data(init_dict, df)
+        x0 = backward_transformation(start_values(init_dict, df, 'init'))
+
+        contrib, scores = likelihood_contributions(x0, init_dict, prep)
+        np.testing.assert_equal(scores.shape, (df.shape[0], len(x0)))
+        np.testing.assert_almost_equal(-np.mean(contrib), log_likelihood(x0, init_dict, prep))
+        np.testing.assert_array_almost_equal(
+            -np.mean(scores, axis=0), log_likelihood_gradient(x0, init_dict, prep))
+        _, opg = information_matrices(x0, init_dict, prep)
+        np.testing.assert_array_almost_equal(scores.T.dot(scores) / df.shape[0], opg)
+
+        contrib_rev, scores_rev = likelihood_contributions(x0, init_dict, df.iloc[::-1])
+        np.testing.assert_array_almost_equal(contrib_rev, contrib[::-1])
+        np.testing.assert_array_almost_equal(scores_rev, scores[::-1])
+
+    cleanup()
+
+
+def test18():
+    """This test ensures that the evaluation of the criterion function, its derivatives and the
+    individual contributions on shards of the estimation data is reproducible irrespective of the
+    number of workers and agrees with the evaluation on the complete data.
+    """
+    for _ in range(5):
+        constr = dict()
+        constr['DETERMINISTIC'], constr['AGENTS'] = False, 1000
+        generate_random_dict(constr)
+        init_dict = read('test.grmpy.ini')
+        df = simulate('test.grmpy.ini')
+        x0 = backward_transformation(start_values(init_dict, df, 'init'))
+
+        rslt = []
+        for workers, chunksize in [(1, 0), (1, 77), (2, 77), (4, 77)]:
+            init_dict['ESTIMATION']['workers'] = workers
+            init_dict['ESTIMATION']['chunksize'] = chunksize
+            prep = prepare_data(init_dict, df)
+            rslt_workers = [log_likelihood(x0, init_dict, prep),
+                            log_likelihood_gradient(x0, init_dict, prep)]
+            rslt_workers += list(information_matrices(x0, init_dict, prep))
+            rslt_workers += list(likelihood_contributions(x0, init_dict, prep))
+            rslt += [rslt_workers]
+
+        for i in range(len(rslt[0])):
+            np.testing.assert_array_almost_equal(rslt[0][i], rslt[1][i])
+            for other in rslt[2:]:
+                np.testing.assert_array_equal(rslt[1][i], other[i])
+
+    cleanup()
+
+
+def test19(monkeypatch):
+    """This test ensures that streaming the estimation data in blocks from the memory-mapped cache
+    leads to the same criterion function value, derivatives and estimation results as the
+    evaluation on the data frame. By default the streaming estimation never reads the whole data
+    file into memory.
+    """
+    def read_cache(cache):
+        raise AssertionError('The streaming estimation reads the whole cache into memory.')
+    monkeypatch.setattr(estimate_data, 'read_cache', read_cache)
+
+    for _ in range(3):
+        constr = dict()
+        constr['DETERMINISTIC'], constr['AGENTS'], constr['MAXITER'] = False, 1000, 10
+        constr['START'] = 'init'
+        dict_ = generate_random_dict(constr)
+        dict_['ESTIMATION']['chunksize'] = 150
+        print_dict(dict_)
+        init_dict = read('test.grmpy.ini')
+        df = simulate('test.grmpy.ini')
+        x0 = backward_transformation(start_values(init_dict, df, 'init'))
+
+        source = init_dict['SIMULATION']['source']
+        for fname in [init_dict['ESTIMATION']['file'], source + '.grmpy.pkl']:
+            data = read_data(fname)
+            prep = prepare_stream(init_dict, load_cache(fname))
+            np.testing.assert_array_equal(load_cache(fname)['labels'], list(data.columns))
+            np.testing.assert_almost_equal(
+                log_likelihood(x0, init_dict, prep), log_likelihood(x0, init_dict, data))
+            np.testing.assert_array_almost_equal(
+                log_likelihood_gradient(x0, init_dict, prep),
+                log_likelihood_gradient(x0, init_dict, data))
+            for a, b in zip(information_matrices(x0, init_dict, prep),
+                            information_matrices(x0, init_dict, prepare_data(init_dict, data))):
+                np.testing.assert_array_almost_equal(a, b)
+            for a, b in zip(likelihood_contributions(x0, init_dict, prep),
+                            likelihood_contributions(x0, init_dict, data)):
+                np.testing.assert_array_almost_equal(a, b)
+
+        rslt_memory = estimate('test.grmpy.ini')
+        os.remove('comparison.grmpy.txt')
+        dict_['ESTIMATION']['stream'] = 1
+        print_dict(dict_)
+        rslt_stream = estimate('test.grmpy.ini')
+        np.testing.assert_equal(os.path.isfile('comparison.grmpy.txt'), False)
+        np.testing.assert_array_almost_equal(
+            rslt_memory['AUX']['x_internal'], rslt_stream['AUX']['x_internal'])
+        np.testing.assert_array_almost_equal(
+            rslt_memory['AUX']['standard_errors'], rslt_stream['AUX']['standard_errors'])
+
+        # The cache is renewed as soon as the data file changes.
+        df.iloc[:10].to_pickle(init_dict['SIMULATION']['source'] + '.grmpy.pkl')
+        cache = load_cache(init_dict['SIMULATION']['source'] + '.grmpy.pkl')
+        np.testing.assert_equal(cache['num_agents'], 10)
+
+        init_dict = read('test.grmpy.ini')
+        init_dict['ESTIMATION']['comparison'] = 1
+        with pytest.raises(UserError):
+            check_initialization_dict(init_dict)
+
+    cleanup()
+
+
+def test20():
+    """This test ensures that the simulated data is written in each of the requested output formats
+    and that the estimation process leads to the same results for all of them. The parquet and
+    feather formats are only tested if pyarrow is installed.
+    """
+    formats = ['npz', 'pkl'] + (['parquet', 'feather'] if pyarrow is not None else [])
+    for _ in range(3):
+        constr = dict()
+        constr['DETERMINISTIC'], constr['AGENTS'], constr['MAXITER'] = False, 500, 5
+        constr['START'] = 'init'
+        dict_ = generate_random_dict(constr)
+        dict_['SIMULATION']['formats'] = formats + ['txt']
+        source = dict_['SIMULATION']['source']
+        print_dict(dict_)
+        df = simulate('test.grmpy.ini')
+
+        expected = [source + '.grmpy.' + format_ for format_ in formats + ['txt', 'info']]
+        np.testing.assert_equal(sorted(glob.glob(source + '.grmpy.*')), sorted(expected))
+
+        rslt = []
+        for format_ in formats + ['txt']:
+            data = read_data(source + '.grmpy.' + format_)
+            if format_ == 'txt':
+                np.testing.assert_array_almost_equal(data.values, df.values, 5)
+            else:
+                pd.testing.assert_frame_equal(data, df)
+            dict_['ESTIMATION']['file'] = source + '.grmpy.' + format_
+            print_dict(dict_)
+            rslt += [estimate('test.grmpy.ini')['AUX']['x_internal']]
+
+        # The text file is rounded, so its estimates only agree approximately.
+        for other in rslt[1:-1]:
+            np.testing.assert_array_equal(rslt[0], other)
+        np.testing.assert_array_almost_equal(rslt[0], rslt[-1], 3)
+
+        dict_['SIMULATION']['formats'] = []
+        print_dict(dict_)
+        cleanup('init_file')
+        simulate('test.grmpy.ini')
+        np.testing.assert_equal(glob.glob(source + '.grmpy.*'), [source + '.grmpy.info'])
+
+    cleanup()
+
+
+def test21():
+    """This test ensures that the simulation in chunks leads to the same unobservables, covariates
+    and treatment decisions as the simulation of the whole sample at once, that the outcomes agree
+    up to rounding and that the returned summary agrees with the simulated data. The parquet
+    format is only compared if pyarrow is installed.
+    """
+    formats = ['npz', 'parquet'] if pyarrow is not None else ['npz']
+    for _ in range(3):
+        constr = dict()
+        constr['DETERMINISTIC'], constr['AGENTS'] = False, np.random.randint(500, 1000)
+        dict_ = generate_random_dict(constr)
+        dict_['SIMULATION']['formats'] = formats + ['txt']
+        source = dict_['SIMULATION']['source']
+        print_dict(dict_)
+        df = simulate('test.grmpy.ini')
+        init_dict = read('test.grmpy.ini')
+
+        dict_['SIMULATION']['chunksize'] = np.random.randint(1, 200)
+        print_dict(dict_)
+        summary = simulate('test.grmpy.ini')
+
+        dep = init_dict['ESTIMATION']['dependent']
+        outcomes = [dep, dep + '1', dep + '0']
+        for format_ in formats:
+            data = read_data(source + '.grmpy.' + format_)
+            np.testing.assert_equal(list(data.columns), list(df.columns))
+            others = [label for label in df.columns if label not in outcomes]
+            np.testing.assert_array_equal(data[others].values, df[others].values)
+            np.testing.assert_array_almost_equal(data[outcomes].values, df[outcomes].values, 10)
+        np.testing.assert_array_almost_equal(read_data(source + '.grmpy.txt').values, df.values, 5)
+
+        expected = data_summary(init_dict, df)
+        for key_ in ['num_agents', 'num_treated', 'num_untreated']:
+            np.testing.assert_equal(summary[key_], expected[key_])
+        for label in ['Outcomes', 'Effects']:
+            for group in ['All', 'Treated', 'Untreated']:
+                np.testing.assert_array_almost_equal(summary[label][group][:2],
+                                                     expected[label][group][:2])
+        np.testing.assert_array_almost_equal(summary['x_mean'], expected['x_mean'])
+
+    cleanup()
+
+
+def test22():
+    """This test ensures that the legacy random number generator reproduces the draws from numpy's
+    global random state and that the simulation leaves the global random state unchanged.
+    """
+    for _ in range(5):
+        constr = dict()
+        constr['DETERMINISTIC'], constr['AGENTS'] = False, np.random.randint(1, 1000)
+        generate_random_dict(constr)
+        init_dict = read('test.grmpy.ini')
+
+        state = np.random.get_state()
+        df = simulate('test.grmpy.ini')
+        np.testing.assert_equal(np.random.get_state(), state)
+
+        # The reference replicates the simulation of the earlier releases.
+        num_agents, types = init_dict['SIMULATION']['agents'], init_dict['AUX']['types']
+        np.random.seed(init_dict['SIMULATION']['seed'])
+        U = np.random.multivariate_normal(
+            np.zeros(3), construct_covariance_matrix(init_dict), num_agents)
+        X = np.random.multivariate_normal(
+            np.zeros(len(types)), np.identity(len(types)), num_agents)
+        X[:, 0] = 1.0
+        for i, type_ in enumerate(types):
+            if isinstance(type_, list) and type_[0] == 'binary' and i != 0:
+                X[:, i] = np.random.binomial(1, type_[1], size=num_agents)
+            elif isinstance(type_, list) and type_[0] == 'categorical':
+                X[:, i] = np.random.choice(type_[1], size=num_agents, p=type_[2])
+        np.random.set_state(state)
+
+        np.testing.assert_array_equal(df[['U1', 'U0', 'V']].values, U)
+        labels = [init_dict['varnames'][i] for i in range(len(types))]
+        np.testing.assert_array_equal(df[labels].values, X)
+
+    cleanup()
+
+
+@pytest.mark.skipif(not hasattr(np.random, 'Generator'), reason='requires numpy 1.17 or later')
+def test23():
+    """This test ensures that the simulation with Generator objects is reproducible and that the
+    simulation in chunks leads to the same data as the simulation of the whole sample at once.
+    """
+    for rng in ['pcg64', 'philox']:
+        constr = dict()
+        constr['DETERMINISTIC'], constr['AGENTS'] = False, np.random.randint(500, 1000)
+        dict_ = generate_random_dict(constr)
+        dict_['SIMULATION']['rng'], dict_['SIMULATION']['formats'] = rng, ['npz']
+        source = dict_['SIMULATION']['source']
+        print_dict(dict_)
+        df = simulate('test.grmpy.ini')
+        pd.testing.assert_frame_equal(simulate('test.grmpy.ini'), df)
+
+        dict_['SIMULATION']['chunksize'] = np.random.randint(1, 200)
+        print_dict(dict_)
+        simulate('test.grmpy.ini')
+        pd.testing.assert_frame_equal(read_data(source + '.grmpy.npz'), df)
+
+    cleanup()
+
+
+def test24():
+    """This test ensures that the sampler of the unobservables factorizes each covariance matrix
+    only once, reproduces the covariance matrix and reuses its buffers.
+    """
+    for _ in range(5):
+        generate_random_dict({'DETERMINISTIC': False})
+        init_dict = read('test.grmpy.ini')
+        cov = construct_covariance_matrix(init_dict)
+
+        sampler = create_sampler(init_dict)
+        np.testing.assert_equal(create_sampler(init_dict)['factor'] is sampler['factor'], True)
+        for is_legacy in [True, False]:
+            factor = covariance_factor(cov, is_legacy)
+            np.testing.assert_array_almost_equal(np.dot(factor.T, factor), cov)
+
+        streams = random_streams(init_dict)
+        draws = draw_unobservables(sampler, streams['U'], 100)
+        np.testing.assert_equal(draws.base is sampler['draws'], True)
+        np.testing.assert_equal(
+            draw_unobservables(sampler, streams['U'], 50).base is sampler['draws'], True)
+
+
+def test25():
+    """This test ensures that the in-memory simulation and estimation lead to the same results as
+    the corresponding processes that are based on the initialization file, without creating any
+    files.
+    """
+    for _ in range(3):
+        constr = dict()
+        constr['DETERMINISTIC'], constr['AGENTS'], constr['MAXITER'] = False, 500, 5
+        constr['START'] = 'init'
+        dict_ = generate_random_dict(constr)
+        dict_['ESTIMATION']['file'] = dict_['SIMULATION']['source'] + '.grmpy.pkl'
+        print_dict(dict_)
+        init_dict = read('test.grmpy.ini')
+
+        spec = process_init_dict(init_dict)
+        for key_ in ['TREATED', 'UNTREATED', 'CHOICE', 'DIST']:
+            np.testing.assert_equal(spec[key_], init_dict[key_])
+        for key_ in ['SIMULATION', 'ESTIMATION', 'AUX', 'varnames']:
+            np.testing.assert_equal(spec[key_], init_dict[key_])
+
+        df = simulate('test.grmpy.ini')
+        rslt = estimate('test.grmpy.ini')
+        cleanup('init_file')
+
+        df_memory = simulate_in_memory(init_dict)
+        rslt_memory = estimate_in_memory(init_dict, df_memory)
+        np.testing.assert_equal(glob.glob('*.grmpy.*'), ['test.grmpy.ini'])
+
+        pd.testing.assert_frame_equal(df_memory, df)
+        np.testing.assert_array_equal(rslt_memory['AUX']['x_internal'], rslt['AUX']['x_internal'])
+
+    cleanup()
+
+
+def test26():
+    """This test ensures that the column index of the specification agrees with the variable
+    names and the parameter vector and that specifications with many covariates are processed.
+    """
+    for _ in range(5):
+        generate_random_dict()
+        init_dict = read('test.grmpy.ini')
+        for key_ in ['TREATED', 'UNTREATED', 'CHOICE']:
+            labels = [init_dict['varnames'][j - 1] for j in init_dict[key_]['order']]
+            np.testing.assert_equal(init_dict['AUX']['labels'][key_], labels)
+            np.testing.assert_equal(
+                np.array(init_dict['varnames'])[init_dict['AUX']['columns'][key_]], labels)
+        x0 = np.array(init_dict['AUX']['init_values'])
+        for key_ in ['TREATED', 'UNTREATED', 'CHOICE', 'DIST']:
+            np.testing.assert_equal(x0[init_dict['AUX']['slices'][key_]], init_dict[key_]['all'])
+
+    # A specification with thousands of dummy variables.
+    init_dict = read('test.grmpy.ini')
+    num_covars = 5000
+    for key_ in ['TREATED', 'UNTREATED', 'CHOICE']:
+        init_dict[key_]['all'] = np.zeros(num_covars)
+        init_dict[key_]['order'] = ['dummy_{}'.format(i) for i in range(num_covars)]
+        init_dict[key_]['types'] = [['binary', 0.5]] * num_covars
+    init_dict['CHOICE']['types'][3] = ['binary', 0.2]
+    init_dict.pop('varnames')
+
+    with pytest.raises(UserError):
+        process_init_dict(init_dict)
+
+    init_dict['CHOICE']['types'][3] = 'nonbinary'
+    spec = process_init_dict(init_dict)
+    np.testing.assert_equal(len(spec['varnames']), num_covars)
+    np.testing.assert_equal(spec['AUX']['types'][0], 'nonbinary')
+    np.testing.assert_equal(spec['AUX']['types'][1:], [['binary', 0.5]] * (num_covars - 1))
+
+
+def test27():
+    """This test ensures that the cached specifications of the read function agree with the
+    specification that is processed from scratch and that each call returns an independent copy.
+    """
+    for _ in range(5):
+        generate_random_dict()
+        invalidate()
+        init_dict = read('test.grmpy.ini')
+        np.testing.assert_equal(list(SPECS.keys()), [os.path.abspath('test.grmpy.ini')])
+
+        init_dict_cached = read('test.grmpy.ini')
+        np.testing.assert_equal(init_dict_cached, init_dict)
+        np.testing.assert_equal(init_dict_cached['AUX']['slices'], init_dict['AUX']['slices'])
+
+        init_dict_cached['TREATED']['all'][0] += 1.0
+        init_dict_cached['AUX']['init_values'][0] += 1.0
+        init_dict_cached['varnames'] += ['other']
+        np.testing.assert_equal(read('test.grmpy.ini'), init_dict)
+
+        # Any change of the file leads to a new import.
+        dict_ = generate_random_dict()
+        np.testing.assert_array_almost_equal(
+            read('test.grmpy.ini')['TREATED']['all'], dict_['TREATED']['all'], 4)
+
+        invalidate('test.grmpy.ini')
+        np.testing.assert_equal(len(SPECS), 0)
+
+    cleanup()
+
+
+def test28():
+    """This test ensures that the data frames and the prepared data of the estimation process are
+    reused for the following estimations as long as the data file does not change.
+    """
+    constr = dict()
+    constr['DETERMINISTIC'], constr['AGENTS'], constr['MAXITER'] = False, 500, 0
+    dict_ = generate_random_dict(constr)
+    simulate('test.grmpy.ini')
+    init_dict = read('test.grmpy.ini')
+    data_file = init_dict['ESTIMATION']['file']
+    invalidate_data()
+
+    data, prep = load_data(init_dict, data_file)
+    data_cached, prep_cached = load_data(init_dict, data_file)
+    assert data_cached is data
+    for key_ in ['TREATED', 'UNTREATED']:
+        assert prep_cached[key_]['X'] is prep[key_]['X']
+
+    prep_expected = prepare_data(init_dict, read_data(data_file))
+    for key_ in ['TREATED', 'UNTREATED']:
+        for label in ['index', 'Y', 'X', 'Z']:
+            np.testing.assert_array_equal(prep_cached[key_][label], prep_expected[key_][label])
+    np.testing.assert_equal(len(prep_cached['shards']), len(prep_expected['shards']))
+
+    rslt = estimate('test.grmpy.ini')
+    rslt_cached = estimate('test.grmpy.ini')
+    np.testing.assert_array_equal(rslt_cached['AUX']['x_internal'], rslt['AUX']['x_internal'])
+    np.testing.assert_equal(len(DATA), 1)
+
+    # A new data set replaces the data in memory.
+    dict_['SIMULATION']['seed'] += 1
+    print_dict(dict_)
+    df = simulate('test.grmpy.ini')
+    data, _ = load_data(init_dict, data_file)
+    pd.testing.assert_frame_equal(data, read_data(data_file))
+    np.testing.assert_equal(data.shape[0], df.shape[0])
+    np.testing.assert_equal(len(DATA), 1)
+
+    invalidate_data(data_file)
+    np.testing.assert_equal(len(DATA), 0)
+
+    cleanup()
+
+
+def test29():
+    """This test ensures that the memorized evaluations of the likelihood function agree with the
+    evaluations from scratch and can not be modified by the caller.
+    """
+    for _ in range(3):
+        constr = dict()
+        constr['DETERMINISTIC'], constr['AGENTS'] = False, 500
+        generate_random_dict(constr)
+        df = simulate('test.grmpy.ini')
+        init_dict = read('test.grmpy.ini')
+        prep = prepare_data(init_dict, df)
+        x0 = start_values(init_dict, df, 'init')
+        x = backward_transformation(x0)
+
+        grad = gradient_interface(x0, init_dict, prep)
+        np.testing.assert_equal(len(prep['memo']), 2)
+        np.testing.assert_equal(calculate_criteria(init_dict, prep, x0),
+                                calculate_criteria(init_dict, df, x0))
+        np.testing.assert_equal(len(prep['memo']), 2)
+        np.testing.assert_array_equal(gradient_interface(x0, init_dict, prep), grad)
+        np.testing.assert_array_equal(gradient_interface(x0, init_dict, df), grad)
+
+        hess, opg = information_matrices(x, init_dict, prep)
+        hess[:] = 0.0
+        matrices = information_matrices(x, init_dict, prepare_data(init_dict, df))
+        for matrix, expected in zip(information_matrices(x, init_dict, prep), matrices):
+            np.testing.assert_array_equal(matrix, expected)
+
+        for i in range(2 * MEMO_SIZE):
+            log_likelihood(x + i, init_dict, prep)
+        np.testing.assert_equal(len(prep['memo']), MEMO_SIZE)
+
+    cleanup()
+
+
+def test30():
+    """This test ensures that the trace of the optimization process stores the evaluations in the
+    requested way and keeps track of the best evaluation.
+    """
+    fname = 'trace.grmpy.jsonl'
+    for _ in range(5):
+        num_paras, num_evals = np.random.randint(1, 5), np.random.randint(1, 200)
+        capacity = np.random.choice([0, np.random.randint(1, 50)])
+        ring = np.random.random_sample() < 0.5
+        parameter = np.random.normal(size=(num_evals, num_paras))
+        crit = np.random.normal(size=num_evals)
+
+        trace = create_trace(num_paras, capacity, ring, fname)
+        for j in range(num_evals):
+            record_evaluation(trace, parameter[j], crit[j])
+        close_trace(trace)
+
+        if capacity == 0:
+            index = np.arange(num_evals)
+        elif ring:
+            index = np.arange(max(num_evals - capacity, 0), num_evals)
+        else:
+            index = np.arange(min(capacity, num_evals))
+
+        parameter_stored, crit_stored = trace_values(trace)
+        np.testing.assert_array_equal(parameter_stored, parameter[index])
+        np.testing.assert_array_equal(crit_stored, crit[index])
+        np.testing.assert_equal(trace['best']['eval'], np.argmin(crit))
+        np.testing.assert_array_equal(trace['best']['parameter'], parameter[np.argmin(crit)])
+
+        with open(fname, 'r') as file_:
+            lines = [json.loads(line) for line in file_]
+        np.testing.assert_array_equal([line['crit'] for line in lines], crit)
+        np.testing.assert_array_equal([line['parameter'] for line in lines], parameter)
+
+    # Evaluations that are not finite never become the best evaluation and an appended trace file
+    # keeps the previous evaluations.
+    trace = create_trace(2, fname=fname, append=True)
+    for crit_ in [np.nan, 1.0, np.nan]:
+        record_evaluation(trace, np.zeros(2), crit_)
+    close_trace(trace)
+    np.testing.assert_equal([trace['best']['eval'], trace['best']['crit']], [1, 1.0])
+    with open(fname, 'r') as file_:
+        np.testing.assert_equal(sum(1 for _ in file_), num_evals + 3)
+
+    # The trace of a bounded optimization leads to the same results.
+    constr = dict()
+    constr['DETERMINISTIC'], constr['AGENTS'], constr['MAXITER'] = False, 500, 20
+    constr['START'], constr['OPTIMIZER'] = 'init', 'SCIPY-POWELL'
+    dict_ = generate_random_dict(constr)
+    simulate('test.grmpy.ini')
+    rslt = estimate('test.grmpy.ini')
+
+    dict_['ESTIMATION']['trace'], dict_['ESTIMATION']['trace_file'] = 5, fname
+    print_dict(dict_)
+    rslt_trace = estimate('test.grmpy.ini')
+    np.testing.assert_array_equal(rslt_trace['AUX']['x_internal'], rslt['AUX']['x_internal'])
+    with open(fname, 'r') as file_:
+        np.testing.assert_equal(sum(1 for _ in file_), rslt['nfev'])
+
+    cleanup()
+
+
+def test31():
+    """This test ensures that the automatic start values agree with the estimates of statsmodels
+    and do not depend on the preparation of the data.
+    """
+    for _ in range(5):
+        constr = dict()
+        constr['DETERMINISTIC'], constr['AGENTS'] = False, 1000
+        generate_random_dict(constr)
+        df = simulate('test.grmpy.ini')
+        init_dict = read('test.grmpy.ini')
+        indicator = init_dict['ESTIMATION']['indicator']
+        dep = init_dict['ESTIMATION']['dependent']
+        labels = init_dict['AUX']['labels']
+
+        # Small samples in one of the states do not lead to well defined start values.
+        if min(df[indicator].sum(), (1 - df[indicator]).sum()) < 100:
+            continue
+
+        expected = []
+        for key_, state in [('TREATED', 1), ('UNTREATED', 0)]:
+            is_state = df[indicator] == state
+            rslt = sm.OLS(df[dep][is_state], df[labels[key_]][is_state]).fit()
+            expected += [rslt.params, [np.sqrt(rslt.scale)]]
+        probit = sm.Probit(df[indicator], df[labels['CHOICE']]).fit(disp=0)
+
+        x0 = auto_start_values(init_dict, prepare_data(init_dict, df))
+        num_treated, num_untreated = [init_dict['AUX'][key_] for key_ in
+                                      ['num_covars_treated', 'num_covars_untreated']]
+        np.testing.assert_array_almost_equal(x0[:num_treated], expected[0])
+        np.testing.assert_array_almost_equal(
+            x0[num_treated:num_treated + num_untreated], expected[2])
+        np.testing.assert_array_almost_equal(x0[-4:], [expected[1][0], 0.0, expected[3][0], 0.0])
+        if probit.mle_retvals['converged']:
+            np.testing.assert_array_almost_equal(
+                x0[num_treated + num_untreated:-4], probit.params, 4)
+
+        data = read_data(init_dict['ESTIMATION']['file'])
+        x0 = auto_start_values(init_dict, prepare_data(init_dict, data))
+        init_dict['ESTIMATION']['chunksize'], init_dict['ESTIMATION']['workers'] = 77, 2
+        cache = load_cache(init_dict['ESTIMATION']['file'])
+        for prep in [prepare_data(init_dict, data), prepare_stream(init_dict, cache)]:
+            np.testing.assert_array_almost_equal(auto_start_values(init_dict, prep), x0, 10)
+
+    cleanup()
+
+
+def test32():
+    """This test ensures that the subsamples of the estimation stages are independent of the
+    preparation of the data and that the estimation stages are reported in the output file.
+    """
+    for _ in range(3):
+        constr = dict()
+        constr['DETERMINISTIC'], constr['AGENTS'], constr['MAXITER'] = False, 1000, 50
+        dict_ = generate_random_dict(constr)
+        df = simulate('test.grmpy.ini')
+        init_dict = read('test.grmpy.ini')
+        x0 = start_values(init_dict, df, 'init')
+
+        data = read_data(init_dict['ESTIMATION']['file'])
+        prep = prepare_data(init_dict, data)
+        prep_stream = prepare_stream(init_dict, load_cache(init_dict['ESTIMATION']['file']))
+        agents = np.sort(np.random.choice(data.shape[0], 100, replace=False))
+        expected = calculate_criteria(init_dict, data.iloc[agents], x0)
+        for prep_ in [prep, prep_stream]:
+            subsample = subsample_data(init_dict, prep_, agents)
+            np.testing.assert_almost_equal(calculate_criteria(init_dict, subsample, x0), expected)
+        subsample = subsample_data(init_dict, prep, np.arange(data.shape[0]))
+        for key_ in ['TREATED', 'UNTREATED']:
+            for label in ['index', 'Y', 'X', 'Z']:
+                np.testing.assert_array_equal(subsample[key_][label], prep[key_][label])
+
+        dict_['ESTIMATION']['stages'] = [0.1, 0.5]
+        print_dict(dict_)
+        rslt = estimate('test.grmpy.ini')
+        np.testing.assert_equal([stage['share'] for stage in rslt['stages']], [0.1, 0.5, 1.0])
+        np.testing.assert_equal([stage['agents'] for stage in rslt['stages']], [100, 500, 1000])
+        with open('est.grmpy.info', 'r') as file_:
+            assert 'Estimation Stages' in file_.read()
+
+        init_dict['ESTIMATION']['stages'] = [0.5, 0.1, 1.0]
+        with pytest.raises(UserError):
+            check_initialization_dict(init_dict)
+
+    cleanup()
+
+
+def test33():
+    """This test ensures that the mini-batch optimizer provides the same output as the SciPy
+    optimizers and that its final refinement leads to the maximum of the likelihood function.
+    """
+    constr = dict()
+    constr['DETERMINISTIC'], constr['AGENTS'], constr['MAXITER'] = False, 2000, 200
+    constr['START'], constr['OPTIMIZER'] = 'init', 'SCIPY-BFGS'
+    dict_ = generate_random_dict(constr)
+    simulate('test.grmpy.ini')
+    rslt = estimate('test.grmpy.ini')
+
+    dict_['ESTIMATION']['optimizer'] = 'GRMPY-ADAM'
+    dict_['GRMPY-ADAM'] = {'batch': 200, 'rate': 0.05, 'decay': 0.01, 'refine': 200}
+    print_dict(dict_)
+    rslt_adam = estimate('test.grmpy.ini')
+    np.testing.assert_equal(sorted(rslt_adam.keys()), sorted(rslt.keys()))
+    assert rslt_adam['crit'] < rslt['crit'] + 1e-5
+    assert rslt_adam['nfev'] > 200
+
+    init_dict = read('test.grmpy.ini')
+    np.testing.assert_equal(init_dict['GRMPY-ADAM'], dict_['GRMPY-ADAM'])
+    init_dict['GRMPY-ADAM']['batch'] = 0
+    with pytest.raises(UserError):
+        check_initialization_dict(init_dict)
+
+    cleanup()
+
+
+def test34():
+    """This test ensures that the hessian matrix of the criterion function with respect to the
+    transformed parameters agrees with its numerical approximation and that the optimizers based
+    on second derivatives reach the criterion function value of BFGS.
+    """
+    for _ in range(3):
+        constr = dict()
+        constr['DETERMINISTIC'], constr['AGENTS'], constr['MAXITER'] = False, 2000, 200
+        constr['START'], constr['OPTIMIZER'] = 'init', 'SCIPY-BFGS'
+        dict_ = generate_random_dict(constr)
+        df = simulate('test.grmpy.ini')
+        init_dict = read('test.grmpy.ini')
+        x0 = start_values(init_dict, df, 'init')
+        prep = prepare_data(init_dict, df)
+
+        hess = hessian_interface(x0, init_dict, prep)
+        hess_num = approx_fprime(x0, gradient_interface, args=(init_dict, prep), centered=True)
+        np.testing.assert_array_almost_equal(hess, hess_num, 4)
+        np.testing.assert_array_almost_equal(hess, hess.T)
+
+        # The outer product of the scores with respect to the transformed parameters
+        x = backward_transformation(x0)
+        _, scores = likelihood_contributions(x, init_dict, df)
+        scores[:, [-4, -2]] *= x[[-4, -2]]
+        scores[:, [-3, -1]] *= 1 - x[[-3, -1]] ** 2
+        np.testing.assert_array_almost_equal(hessian_interface(x0, init_dict, prep, kind='opg'),
+                                             scores.T.dot(scores) / scores.shape[0])
+
+        # Poorly identified specifications are not suitable for the comparison. The optimizers
+        # may still end in different local optima with almost the same criterion function value.
+        rslt = estimate('test.grmpy.ini')
+        if not rslt['success']:
+            continue
+        for optimizer in ['GRMPY-NEWTON', 'GRMPY-BHHH', 'SCIPY-TRUST-NCG', 'SCIPY-TRUST-EXACT']:
+            dict_['ESTIMATION']['optimizer'] = optimizer
+            dict_[optimizer] = {'gtol': 1e-6}
+            print_dict(dict_)
+            np.testing.assert_almost_equal(estimate('test.grmpy.ini')['crit'], rslt['crit'], 3)
+
+    cleanup()
+
+
+def test35():
+    """This test ensures that the screening of several starts does not lead to a larger criterion
+    function value than the estimation from the unperturbed start values and that starts that
+    trail the best start are abandoned.
+    """
+    constr = dict()
+    constr['DETERMINISTIC'], constr['AGENTS'], constr['MAXITER'] = False, 1000, 100
+    constr['START'], constr['OPTIMIZER'] = 'init', 'SCIPY-BFGS'
+    dict_ = generate_random_dict(constr)
+    simulate('test.grmpy.ini')
+    rslt = estimate('test.grmpy.ini')
+    assert rslt['starts'] == []
+
+    dict_['ESTIMATION'].update({'starts': 4, 'rounds': 2, 'margin': 1e+6, 'processes': 2})
+    print_dict(dict_)
+    rslt_starts = estimate('test.grmpy.ini')
+    assert rslt_starts['crit'] <= rslt['crit'] + 1e-10
+    assert len(rslt_starts['starts']) == 4
+    assert [start['status'] for start in rslt_starts['starts']].count('selected') == 1
+    assert 'abandoned' not in [start['status'] for start in rslt_starts['starts']]
+
+    dict_['ESTIMATION'].update({'margin': 0.0, 'rounds': 1, 'spread': 1.0})
+    print_dict(dict_)
+    rslt_starts = estimate('test.grmpy.ini')
+    for start in rslt_starts['starts']:
+        assert start['status'] in ['selected', 'abandoned', 'converged', 'stopped']
+        if start['status'] == 'selected':
+            assert start['crit'] == min(start_['crit'] for start_ in rslt_starts['starts'])
+
+    init_dict = read('test.grmpy.ini')
+    init_dict['ESTIMATION']['starts'] = 0
+    with pytest.raises(UserError):
+        check_initialization_dict(init_dict)
+
+    cleanup()
+
+
+def test36():
+    """This test ensures that an estimation that exhausts its time budget writes a checkpoint, from
+    which the estimation can be resumed.
+    """
+    constr = dict()
+    constr['DETERMINISTIC'], constr['AGENTS'], constr['MAXITER'] = False, 1000, 100
+    constr['START'], constr['OPTIMIZER'] = 'init', 'SCIPY-BFGS'
+    dict_ = generate_random_dict(constr)
+    simulate('test.grmpy.ini')
+
+    dict_['ESTIMATION'].update({'start': 'resume', 'checkpoint': 'checkpoint.grmpy.json'})
+    print_dict(dict_)
+    with pytest.raises(UserError):
+        estimate('test.grmpy.ini')
+
+    dict_['ESTIMATION'].update({'start': 'init', 'budget': 1e-10})
+    print_dict(dict_)
+    rslt = estimate('test.grmpy.ini')
+    checkpoint = json.load(open('checkpoint.grmpy.json'))
+    assert rslt['status'] == STATUS_BUDGET and not rslt['success']
+    assert checkpoint['status'] == 'budget' and checkpoint['nit'] == 1
+    np.testing.assert_equal(np.isfinite(rslt['AUX']['x_internal']), True)
+
+    dict_['ESTIMATION'].update({'start': 'resume', 'budget': 0.0})
+    print_dict(dict_)
+    rslt_resumed = estimate('test.grmpy.ini')
+    checkpoint = json.load(open('checkpoint.grmpy.json'))
+    assert rslt_resumed['status'] != STATUS_BUDGET
+    assert rslt_resumed['crit'] <= rslt['crit'] + 1e-10
+    assert checkpoint['status'] == 'finished' and checkpoint['nit'] > 1
+
+    # The state of the random number generator is restored as well.
+    init_dict = read('test.grmpy.ini')
+    random_state = np.random.RandomState(123)
+    random_state.standard_normal(5)
+    trace = create_trace(init_dict['AUX']['num_paras'])
+    trace['random_state'] = random_state
+    x0 = np.zeros(init_dict['AUX']['num_paras'])
+    write_checkpoint(init_dict, create_checkpoint(init_dict), x0, trace, 'running')
+    restored = restore_random_state(json.load(open('checkpoint.grmpy.json')))
+    np.testing.assert_equal(restored.standard_normal(5), random_state.standard_normal(5))
+
+    cleanup()
+
+
+def test37():
+    """This test ensures that the estimation starts from the result of a previous estimation,
+    either from the pickled result dictionary or from the info file, and that the coefficients are
+    mapped onto the current specification by the labels of the covariates.
+    """
+    constr = dict()
+    constr['DETERMINISTIC'], constr['AGENTS'], constr['MAXITER'] = False, 1000, 200
+    constr['START'], constr['OPTIMIZER'] = 'auto', 'SCIPY-BFGS'
+    dict_ = generate_random_dict(constr)
+    simulate('test.grmpy.ini')
+    rslt = estimate('test.grmpy.ini')
+    pd.to_pickle(rslt, 'previous.grmpy.pkl')
+    os.rename('est.grmpy.info', 'previous.grmpy.info')
+
+    init_dict = read('test.grmpy.ini')
+    for fname, decimal in [('previous.grmpy.pkl', 7), ('previous.grmpy.info', 4)]:
+        init_dict['ESTIMATION']['start_file'] = fname
+        x0 = backward_transformation(start_values(init_dict, None, 'result'))
+        np.testing.assert_array_almost_equal(x0, rslt['AUX']['x_internal'], decimal)
+
+    # Covariates that are not part of the previous result start at zero.
+    init_dict['AUX']['labels']['CHOICE'][-1] = 'NEW'
+    x0 = start_values(init_dict, None, 'result')
+    assert x0[init_dict['AUX']['slices']['CHOICE']][-1] == 0.0
+
+    dict_['ESTIMATION'].update({'start': 'result', 'start_file': 'previous.grmpy.pkl'})
+    print_dict(dict_)
+    rslt_warm = estimate('test.grmpy.ini')
+    assert rslt_warm['nfev'] <= rslt['nfev']
+    assert rslt_warm['crit'] <= rslt['crit'] + 1e-10
+
+    init_dict['ESTIMATION']['start_file'] = 'missing.grmpy.pkl'
+    with pytest.raises(UserError):
+        start_values(init_dict, None, 'result')
+
+    cleanup()
+
+
+def test38():
+    """This test ensures that an estimation result is restored from its archive, that large arrays
+    are memory-mapped and that unsupported archives are rejected.
+    """
+    constr = dict()
+    constr['DETERMINISTIC'], constr['AGENTS'], constr['MAXITER'] = False, 1000, 50
+    constr['START'], constr['OPTIMIZER'] = 'auto', 'SCIPY-BFGS'
+    generate_random_dict(constr)
+    simulate('test.grmpy.ini')
+    rslt = estimate('test.grmpy.ini')
+
+    def assert_equal_content(content, restored):
+        if isinstance(content, dict):
+            assert sorted(content.keys()) == sorted(restored.keys())
+            for key_ in content.keys():
+                assert_equal_content(content[key_], restored[key_])
+        elif isinstance(content, (list, tuple)):
+            assert len(content) == len(restored)
+            for value, value_restored in zip(content, restored):
+                assert_equal_content(value, value_restored)
+        else:
+            np.testing.assert_equal(restored, content)
+
+    for mmap in [True, False]:
+        save_result(rslt, 'rslt.grmpy.npz')
+        assert_equal_content(rslt, load_result('rslt.grmpy.npz', mmap))
+
+    rslt['AUX']['hess_inv'] = np.random.normal(size=(300, 300))
+    save_result(rslt, 'rslt.grmpy.npz')
+    hess_inv = load_result('rslt.grmpy.npz')['AUX']['hess_inv']
+    assert isinstance(hess_inv, np.memmap)
+    np.testing.assert_equal(hess_inv, rslt['AUX']['hess_inv'])
+    del hess_inv
+
+    # The archive is a valid npz file as well.
+    with np.load('rslt.grmpy.npz') as archive:
+        np.testing.assert_equal(archive['AUX/hess_inv'], rslt['AUX']['hess_inv'])
+
+    init_dict = read('test.grmpy.ini')
+    init_dict['ESTIMATION']['start_file'] = 'rslt.grmpy.npz'
+    x0 = backward_transformation(start_values(init_dict, None, 'result'))
+    np.testing.assert_array_almost_equal(x0, rslt['AUX']['x_internal'])
+
+    np.savez('data.grmpy.npz', x=np.zeros(3))
+    with pytest.raises(UserError):
+        load_result('data.grmpy.npz')
+
+    cleanup()
+
+
+def test39():
+    """This test ensures that the cache of estimation results returns the stored result for an
+    identical estimation, that changes of the data are detected and that the cache is bounded
+    in size.
+    """
+    constr = dict()
+    constr['DETERMINISTIC'], constr['AGENTS'], constr['MAXITER'] = False, 1000, 50
+    constr['START'], constr['OPTIMIZER'] = 'auto', 'SCIPY-BFGS'
+    dict_ = generate_random_dict(constr)
+    simulate('test.grmpy.ini')
+
+    directory = 'results.cache'
+    dict_['ESTIMATION']['cache'] = directory
+    print_dict(dict_)
+
+    rslt = estimate('test.grmpy.ini')
+    info = open('est.grmpy.info').read()
+    rslt_cached = estimate('test.grmpy.ini')
+    assert open('est.grmpy.info').read() == info
+    np.testing.assert_equal(rslt_cached['AUX']['x_internal'], rslt['AUX']['x_internal'])
+    np.testing.assert_equal(rslt_cached['AUX']['hess_inv'], rslt['AUX']['hess_inv'])
+    np.testing.assert_equal(rslt_cached['crit'], rslt['crit'])
+
+    statistics = cache_statistics(directory)
+    assert (statistics['hits'], statistics['misses'], statistics['stores']) == (1, 1, 1)
+    assert statistics['entries'] == 1 and statistics['hit_rate'] == 0.5
+
+    # A change of the data file leads to a new estimation.
+    dict_['SIMULATION']['agents'] += 1
+    print_dict(dict_)
+    simulate('test.grmpy.ini')
+    estimate('test.grmpy.ini')
+    statistics = cache_statistics(directory)
+    assert (statistics['misses'], statistics['entries']) == (2, 2)
+
+    dict_['ESTIMATION'].update({'cache_size': 1e-6, 'maxiter': 0})
+    print_dict(dict_)
+    estimate('test.grmpy.ini')
+    statistics = cache_statistics(directory)
+    assert statistics['entries'] == 0 and statistics['evictions'] == 3
+    assert 'Evictions:' in cache_report(directory)
+
+    shutil.rmtree(directory)
+    cleanup()